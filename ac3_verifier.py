@@ -0,0 +1,234 @@
+''' Check every crossword creator's ac3 against a reference fixpoint, and time it.
+
+    python ac3_verifier.py                                  # every creator on crossword0..3
+    python ac3_verifier.py --creators pcoster iron8kid --puzzles crossword2 puzzle_6
+    python ac3_verifier.py --kenken 4 6 8 --crosswords 10 --count 100 --seed 0
+
+Arc consistency has a single fixpoint, the largest arc-consistent domains, so
+the order a creator revises arcs in does not matter: after node consistency
+and ac3 its domains must hold exactly the reference values. KenKen references
+come from the generic Solver's ac3; the generic Solver is KenKen only, so
+crossword references come from a plain letter-indexed AC-3 here, in which
+crossing words must also differ (the sizes ac3_test.ipynb expects). When the
+reference wipes a domain out, a creator only has to return False, since what
+is left in the other domains then depends on where it stopped.
+
+Each creator runs in its own process with a timeout, as in benchmark.py, and
+reports its revise calls per second of ac3 (counted through solver_events).
+Puzzles are the names benchmark.puzzles() knows, or generated ones
+(puzzle_generator): unique KenKens of the given sizes, and crossword
+structures filled from words2.
+'''
+import argparse
+import contextlib
+import importlib
+import io
+import multiprocessing as mp
+import queue
+import statistics
+import sys
+import tempfile
+import time
+from collections import Counter, deque
+from pathlib import Path
+from typing import Dict, FrozenSet, Hashable, List, NamedTuple, Tuple
+
+sys.path.append(str(Path(__file__).parent / 'generic'))
+from benchmark import CREATORS, puzzles
+from portfolio import Puzzle, is_crossword
+from solver_events import Hooks, hook_creator
+
+WORDS = Path(__file__).parent / 'assets' / 'crossword_data' / 'words2.txt'
+
+Domains = Dict[Hashable, FrozenSet]     # plain: (i, j, direction) -> words, or cage cells -> digit tuples
+
+class Fixpoint(NamedTuple):
+    consistent: bool    # False if a domain was wiped out
+    domains: Domains
+
+class Report(NamedTuple):
+    creator: str
+    puzzle: str
+    status: str         # ok / wrong / missed wipeout / false wipeout / timeout / error: ...
+    wrong: int          # variables whose domain differs from the reference
+    revisions: int
+    seconds: float      # in ac3
+
+    @property
+    def rate(self) -> float:
+        return self.revisions / self.seconds if self.seconds else 0.0
+
+def _key(var) -> Hashable:
+    if hasattr(var, 'direction'):
+        return (var.i, var.j, var.direction)
+    return tuple(tuple(cell) for cell in var.cells)
+
+def _plain(domains: dict) -> Domains:
+    return {_key(var): frozenset(value if isinstance(value, str) else tuple(int(d) for d in value)
+                                 for value in domain)
+            for var, domain in domains.items()}
+
+def crossword_fixpoint(crossword) -> Fixpoint:
+    ''' Node consistency then AC-3 on a Crossword. Crossing words must agree on
+    the shared letter and differ from each other, so a word of x is supported
+    if y has a word with that letter at the crossing other than the word itself;
+    revising counts y's words per crossing letter instead of comparing pairs. '''
+    domains = {var: {word for word in crossword.words if len(word) == var.length} for var in crossword.variables}
+    arcs = deque((x, y) for x in domains for y in crossword.neighbors(x))
+    while arcs:
+        x, y = arcs.popleft()
+        i, j = crossword.overlaps[x, y]
+        letters = Counter(word[j] for word in domains[y])
+        kept = {word for word in domains[x]
+                if letters[word[i]] > (word in domains[y] and word[j] == word[i])}
+        if len(kept) < len(domains[x]):
+            domains[x] = kept
+            if not kept:
+                return Fixpoint(False, _plain(domains))
+            arcs.extend((z, x) for z in crossword.neighbors(x) if z != y)
+    return Fixpoint(True, _plain(domains))
+
+def kenken_fixpoint(path) -> Fixpoint:
+    ''' Node consistency then ac3 with the generic Solver '''
+    from generic_kenken import Kenken
+    from generic_solver import Solver
+    solver = Solver(Kenken(str(path)), ac='bitset')
+    solver.enforce_node_consistency()
+    consistent = solver.ac3()
+    return Fixpoint(consistent, _plain(solver.domains))
+
+def reference(puzzle: Puzzle) -> Fixpoint:
+    if is_crossword(puzzle):
+        from crossword import Crossword
+        return crossword_fixpoint(Crossword(*puzzle))
+    return kenken_fixpoint(puzzle)
+
+def compare(expected: Fixpoint, consistent, domains: Domains) -> Tuple[str, int]:
+    ''' (status, number of wrong domains) of a creator's ac3 result '''
+    if not expected.consistent:
+        return ('ok' if consistent is False else 'missed wipeout'), 0
+    wrong = sum(domains.get(key) != values for key, values in expected.domains.items())
+    if consistent is False:
+        return 'false wipeout', wrong
+    return ('ok' if wrong == 0 else 'wrong'), wrong
+
+def run_ac3(name: str, puzzle: Puzzle) -> Tuple[object, Domains, int, float]:
+    ''' (ac3's return value, plain domains, revise calls, seconds in ac3) of one creator '''
+    creator = importlib.import_module(f'crossword_creators.{name}').CrosswordCreator
+    if is_crossword(puzzle):
+        from crossword import Crossword
+        instance = creator(Crossword(*puzzle))
+    else:
+        from kenken import Kenken
+        from kenken_solver import kenken_solver
+        instance = kenken_solver(creator)(Kenken(puzzle))
+    revisions = 0
+
+    def count(*_):
+        nonlocal revisions
+        revisions += 1
+    hooks = Hooks()
+    hooks.on('on_revise', count)
+    hook_creator(instance, hooks)
+    instance.enforce_node_consistency()
+    start = time.perf_counter()
+    consistent = instance.ac3()
+    elapsed = time.perf_counter() - start
+    return consistent, _plain(instance.domains), revisions, elapsed
+
+def _child(results, name, puzzle):
+    try:
+        with contextlib.redirect_stdout(io.StringIO()):
+            results.put(run_ac3(name, puzzle))
+    except Exception as error:
+        results.put(error)
+
+def check(name: str, puzzle: Puzzle, expected: Fixpoint, label: str = '', timeout: float = 60.0) -> Report:
+    ''' run_ac3 in a child process, killed after `timeout` seconds, compared with `expected` '''
+    ctx = mp.get_context()
+    results = ctx.Queue()
+    process = ctx.Process(target=_child, args=(results, name, puzzle), daemon=True)
+    process.start()
+    try:
+        outcome = results.get(timeout=timeout)
+    except queue.Empty:
+        return Report(name, label, 'timeout', 0, 0, timeout)
+    finally:
+        process.terminate()
+        process.join()
+    if isinstance(outcome, Exception):
+        return Report(name, label, f'error: {outcome!r}', 0, 0, 0.0)
+    consistent, domains, revisions, seconds = outcome
+    status, wrong = compare(expected, consistent, domains)
+    return Report(name, label, status, wrong, revisions, seconds)
+
+def generated(directory, kenken_sizes: List[int] = (), crosswords: int = 0, count: int = 1,
+              seed: int = 0) -> Dict[str, Puzzle]:
+    ''' name -> puzzle for generated instances written to `directory` '''
+    from puzzle_generator import generate_kenken, generate_structure, write_structure
+    directory = Path(directory)
+    lengths = {len(word) for word in WORDS.read_text().split()}
+    found: Dict[str, Puzzle] = {}
+    for n in kenken_sizes:
+        for s in range(seed, seed + count):
+            found[f'kenken_{n}_{s}'] = str(generate_kenken(n, s).write(directory / f'kenken_{n}_{s}.txt'))
+    for s in range(seed, seed + crosswords):
+        lines = generate_structure(15, 15, density=0.4, seed=s, lengths=lengths)
+        found[f'structure_{s}'] = (str(write_structure(lines, directory / f'structure_{s}.txt')), str(WORDS))
+    return found
+
+def verify_all(creators: List[str] = None, instances: Dict[str, Puzzle] = None, timeout: float = 60.0,
+               report=None) -> List[Report]:
+    ''' Every creator on every puzzle of `instances` (default crossword0..3) '''
+    creators = creators or CREATORS
+    if instances is None:
+        instances = {name: puzzle for name, puzzle in puzzles().items() if name.startswith('crossword')}
+    # import what the runs need once here, so forked runs start warm
+    import crossword, kenken, kenken_solver
+    for name in creators:
+        importlib.import_module(f'crossword_creators.{name}')
+    reports = []
+    for label, puzzle in instances.items():
+        expected = reference(puzzle)
+        for name in creators:
+            entry = check(name, puzzle, expected, label, timeout)
+            reports.append(entry)
+            if report is not None:
+                report(entry)
+    return reports
+
+def _print(entry: Report):
+    print(f'{entry.puzzle:>14} {entry.creator:>14}  {entry.revisions:>10,} {entry.rate:>12,.0f}  {entry.status}'
+          + (f' ({entry.wrong} domains)' if entry.wrong else ''))
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0].strip(),
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--creators', nargs='+', help=f'default: {" ".join(CREATORS)}')
+    parser.add_argument('--puzzles', nargs='+', help='puzzle names (default: crossword0..3 unless generating)')
+    parser.add_argument('--kenken', type=int, nargs='*', default=[], help='generate KenKens of these sizes')
+    parser.add_argument('--crosswords', type=int, default=0, help='generate this many 15x15 crosswords')
+    parser.add_argument('--count', type=int, default=1, help='generated KenKens per size (default 1)')
+    parser.add_argument('--seed', type=int, default=0, help='seed of the first generated puzzle')
+    parser.add_argument('--timeout', type=float, default=60.0, help='seconds per creator run (default 60)')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        instances = generated(directory, args.kenken, args.crosswords, args.count, args.seed)
+        if args.puzzles or not instances:
+            available = puzzles()
+            names = args.puzzles or [name for name in available if name.startswith('crossword')]
+            instances.update((name, available[name]) for name in names)
+        print(f"{'puzzle':>14} {'creator':>14}  {'revisions':>10} {'revisions/s':>12}  status")
+        reports = verify_all(args.creators, instances, args.timeout, report=_print)
+
+    print()
+    for name in sorted({entry.creator for entry in reports}):
+        own = [entry for entry in reports if entry.creator == name]
+        passed = sum(entry.status == 'ok' for entry in own)
+        rates = [entry.rate for entry in own if entry.status == 'ok']
+        median = f'{statistics.median(rates):,.0f} revisions/s' if rates else '-'
+        print(f'{name:>14}: {passed}/{len(own)} correct, median {median}')
+
+if __name__ == "__main__":
+    main()
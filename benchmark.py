@@ -0,0 +1,317 @@
+''' Benchmark every crossword creator and the generic Solver, phase by phase.
+
+    python benchmark.py                                    # everything, 3 timed runs each
+    python benchmark.py --solvers pcoster solver:bitset --puzzles puzzle_3 crossword1
+    python benchmark.py --output baseline.json             # store a baseline
+    python benchmark.py --baseline baseline.json           # exit status 1 on a regression
+    python benchmark.py --scaling 1 2 4 8 --puzzles puzzle_9 puzzle_11   # parallel speedup per worker count
+
+Each configuration (a module of crossword_creators, or a generic Solver setup)
+runs on every puzzle: the crossword structures, and the kenken puzzles, which
+the creators see through kenken_solver (the generic Solver is KenKen only).
+Every run is split into the node consistency, initial ac3 and search phases;
+a phase's time is the median over the timed runs, and one extra run under
+tracemalloc gives the peak memory each phase allocated. Search nodes are the
+calls to the creator's backtrack method, or Solver.nodes.
+
+Phases run under a Budget, so a configuration that hangs is recorded as
+'deadline' instead of stalling the suite; each run also gets its own process,
+which is killed ('killed') if a single step overruns the budget by far. Crossword node counts depend on
+string hashing; set PYTHONHASHSEED to make them comparable between runs.
+
+--scaling times generic_parallel.ParallelSolver instead, once per worker count,
+and reports the speedup over the first count. Near-linear scaling means a
+speedup close to the worker count, which needs at least that many cores; the
+core count is printed with the results.
+'''
+import argparse
+import contextlib
+import importlib
+import io
+import json
+import multiprocessing as mp
+import os
+import pkgutil
+import platform
+import queue
+import statistics
+import sys
+import time
+import tracemalloc
+from pathlib import Path
+from typing import Callable, Dict, List, NamedTuple, Optional
+
+sys.path.append(str(Path(__file__).parent / 'generic'))
+import crossword_creators
+from budget import Budget, BudgetExceeded, BudgetExhausted, budgeted
+from portfolio import Puzzle, is_crossword, verify
+from solver_stats import count_creator
+
+ASSETS = Path(__file__).parent / 'assets'
+PHASES = ('node_consistency', 'ac3', 'search')
+KILL_GRACE = 30     # seconds past the phase deadlines before a run is killed
+CREATORS = sorted(module.name for module in pkgutil.iter_modules(crossword_creators.__path__))
+SOLVERS: Dict[str, dict] = {      # generic Solver configurations -> Solver options
+    'solver': {},
+    'solver:bitset': dict(trail=True, ac='bitset'),
+}
+
+def puzzles() -> Dict[str, Puzzle]:
+    ''' name -> puzzle: crossword0.., then puzzle_0.. '''
+    data = ASSETS / 'crossword_data'
+    found: Dict[str, Puzzle] = {}
+    for structure in sorted(data.glob('structure*.txt')):
+        number = structure.stem[len('structure'):]
+        found[f'crossword{number}'] = (str(structure), str(data / f'words{number}.txt'))
+    kenkens = sorted((ASSETS / 'kenken_puzzles').glob('puzzle_*.txt'), key=lambda path: int(path.stem.split('_')[1]))
+    found.update((path.stem, str(path)) for path in kenkens)
+    return found
+
+class Run(NamedTuple):
+    status: str                  # solved / no solution / invalid / deadline / nodes / memory / killed / error: ...
+    times: Dict[str, float]      # phase -> seconds, for the phases that ran
+    nodes: int
+    memory: Dict[str, int]       # phase -> peak bytes allocated during the phase (memory runs only)
+
+def _phases(solver: str, puzzle: Puzzle, budget: Budget):
+    ''' The phase callables of one run, and a function reading its node count '''
+    if solver in SOLVERS:
+        if is_crossword(puzzle):
+            return None
+        from generic_kenken import Kenken
+        from generic_solver import Solver
+        instance = Solver(Kenken(puzzle), **SOLVERS[solver])
+
+        def guarded(step):
+            def run():
+                instance.budget = budget.start()
+                try:
+                    return step()
+                except BudgetExceeded as exceeded:
+                    return budget.exhausted(exceeded.reason, instance.stats.as_dict())
+                finally:
+                    instance.budget = None
+            return run
+        return ([guarded(instance.enforce_node_consistency), guarded(instance.propagate), guarded(instance.search)],
+                lambda: instance.nodes)
+    creator = importlib.import_module(f'crossword_creators.{solver}').CrosswordCreator
+    if is_crossword(puzzle):
+        from crossword import Crossword
+        instance = budgeted(creator)(Crossword(*puzzle), budget=budget)
+        if getattr(instance, 'stats', None) is None:
+            count_creator(instance)
+    else:
+        from kenken import Kenken
+        from kenken_solver import kenken_solver
+        instance = budgeted(kenken_solver(creator))(Kenken(puzzle), budget=budget)
+    return ([instance.enforce_node_consistency, instance.ac3, lambda: instance.backtrack(dict())],
+            lambda: budget.nodes)
+
+def _plain(puzzle: Puzzle, assignment: dict) -> dict:
+    if is_crossword(puzzle):
+        return {(var.i, var.j, var.direction): word for var, word in assignment.items()}
+    return {cell: int(digit) for cage, vector in assignment.items() for cell, digit in zip(cage.cells, vector)}
+
+def run_once(solver: str, puzzle: Puzzle, deadline: float = None, memory: bool = False) -> Optional[Run]:
+    ''' One run of every phase; None if `solver` does not apply to `puzzle` '''
+    budget = Budget(deadline=deadline)
+    times, peaks, nodes, status = {}, {}, 0, 'solved'
+    try:
+        with contextlib.redirect_stdout(io.StringIO()):
+            built = _phases(solver, puzzle, budget)
+            if built is None:
+                return None
+            steps, count = built
+            if memory:
+                tracemalloc.start()
+            for phase, step in zip(PHASES, steps):
+                if memory:
+                    base = tracemalloc.get_traced_memory()[0]
+                    tracemalloc.reset_peak()
+                start = time.perf_counter()
+                result = step()
+                times[phase] = time.perf_counter() - start
+                if memory:
+                    peaks[phase] = tracemalloc.get_traced_memory()[1] - base
+                if phase == 'search':
+                    nodes = count()
+                if isinstance(result, BudgetExhausted):
+                    status = result.reason
+                    break
+                if phase == 'ac3' and result is False:
+                    status = 'no solution'
+                    break
+                if phase == 'search':
+                    if not result:
+                        status = 'no solution'
+                    elif not verify(puzzle, _plain(puzzle, result)):
+                        status = 'invalid'
+    except Exception as error:
+        status = f'error: {error!r}'
+    finally:
+        if memory:
+            tracemalloc.stop()
+    return Run(status, times, nodes, peaks)
+
+def _child(results, *args):
+    results.put(run_once(*args))
+
+def run_isolated(solver: str, puzzle: Puzzle, deadline: float = None, memory: bool = False) -> Optional[Run]:
+    ''' run_once in a child process, killed if it outlives its budget: the budget is
+    only checked between nodes and revisions, and one student node can take minutes '''
+    ctx = mp.get_context()
+    results = ctx.Queue()
+    process = ctx.Process(target=_child, args=(results, solver, puzzle, deadline, memory), daemon=True)
+    process.start()
+    try:
+        return results.get(timeout=None if deadline is None else len(PHASES) * deadline + KILL_GRACE)
+    except queue.Empty:
+        return Run('killed', {}, 0, {})
+    finally:
+        process.terminate()
+        process.join()
+
+def benchmark(solvers: List[str] = None, names: List[str] = None, repeat: int = 3,
+              deadline: float = 10.0, report: Callable[[dict], None] = None) -> dict:
+    ''' Run `solvers` (default: every creator and SOLVERS) on the puzzles `names`
+    (default: all) and return the JSON-ready results '''
+    solvers = solvers or CREATORS + list(SOLVERS)
+    available = puzzles()
+    # import what the runs need once here, so forked runs start warm
+    import crossword, kenken, kenken_solver, generic_solver
+    for solver in solvers:
+        if solver not in SOLVERS:
+            importlib.import_module(f'crossword_creators.{solver}')
+    names = names or list(available)
+    results = []
+    for name in names:
+        for solver in solvers:
+            runs = []
+            for _ in range(repeat):
+                run = run_isolated(solver, available[name], deadline)
+                if run is None:
+                    break
+                runs.append(run)
+                if run.status != 'solved':
+                    break   # a failure or an exhausted budget will not improve with repetition
+            if not runs:
+                continue
+            profile = run_isolated(solver, available[name], deadline, memory=True)
+            medians = {phase: statistics.median(run.times[phase] for run in runs)
+                       for phase in PHASES if phase in runs[0].times}
+            entry = dict(solver=solver, puzzle=name, status=runs[0].status,
+                         median=medians, total=sum(medians.values()),
+                         runs={phase: [run.times.get(phase) for run in runs] for phase in medians},
+                         nodes=runs[0].nodes, peak_memory=profile.memory)
+            results.append(entry)
+            if report is not None:
+                report(entry)
+    return dict(meta=dict(python=platform.python_version(), platform=platform.platform(),
+                          hashseed=os.environ.get('PYTHONHASHSEED'), repeat=repeat, deadline=deadline,
+                          date=time.strftime('%Y-%m-%dT%H:%M:%S')),
+                results=results)
+
+def regressions(baseline: dict, current: dict, tolerance: float = 0.25, floor: float = 0.005) -> List[str]:
+    ''' Configurations of `current` that did worse than in `baseline`: solved before
+    and not now, slower in total by more than `tolerance` (relative) plus `floor`
+    seconds, or, when both ran with the same fixed hash seed, more search nodes. '''
+    before = {(entry['solver'], entry['puzzle']): entry for entry in baseline['results']}
+    same_seed = baseline['meta'].get('hashseed') not in (None, 'random') and \
+                baseline['meta'].get('hashseed') == current['meta'].get('hashseed')
+    found = []
+    for entry in current['results']:
+        old = before.get((entry['solver'], entry['puzzle']))
+        if old is None or old['status'] != 'solved':
+            continue
+        label = f"{entry['solver']} on {entry['puzzle']}"
+        if entry['status'] != 'solved':
+            found.append(f"{label}: {entry['status']} (was solved)")
+            continue
+        if entry['total'] > old['total'] * (1 + tolerance) + floor:
+            found.append(f"{label}: {entry['total']*1000:,.1f} ms (was {old['total']*1000:,.1f} ms)")
+        if (same_seed or not entry['puzzle'].startswith('crossword')) and \
+                entry['nodes'] > old['nodes'] * (1 + tolerance):
+            found.append(f"{label}: {entry['nodes']:,} nodes (was {old['nodes']:,})")
+    return found
+
+def scaling(names: List[str] = None, workers: List[int] = (1, 2, 4), repeat: int = 3,
+            report: Callable[[dict], None] = None, **options) -> List[dict]:
+    ''' Median wall time of a ParallelSolver solve (options go to its Solvers,
+    default ac='bitset') per worker count on the kenken puzzles `names` (default:
+    all), and the speedup over the first worker count '''
+    from generic_kenken import Kenken
+    from generic_parallel import ParallelSolver
+    options = options or dict(ac='bitset')
+    available = puzzles()
+    names = names or [name for name in available if not is_crossword(available[name])]
+    results = []
+    for name in names:
+        first = None
+        for count in workers:
+            times, status = [], 'solved'
+            for _ in range(repeat):
+                parallel = ParallelSolver(Kenken(available[name]), workers=count, **options)
+                start = time.perf_counter()
+                solution = parallel.solve(verbose=False)
+                times.append(time.perf_counter() - start)
+                if not solution:
+                    status = 'no solution'
+                elif not verify(available[name], _plain(available[name], solution)):
+                    status = 'invalid'
+            median = statistics.median(times)
+            first = first or median
+            entry = dict(puzzle=name, workers=count, status=status, median=median, speedup=first / median,
+                         tasks=parallel.tasks, donations=parallel.donations)
+            results.append(entry)
+            if report is not None:
+                report(entry)
+    return results
+
+def _print_scaling(entry: dict):
+    print(f"{entry['puzzle']:>11} {entry['workers']:>7}  {entry['median']*1000:>10,.2f}  {entry['speedup']:>7.2f}x  "
+          f"{entry['tasks']:>5} {entry['donations']:>9}  {entry['status']}")
+
+def _print(entry: dict):
+    phases = '  '.join(f"{entry['median'].get(phase, float('nan'))*1000:>10,.2f}" for phase in PHASES)
+    memory = max(entry['peak_memory'].values(), default=0)
+    print(f"{entry['puzzle']:>11} {entry['solver']:>14}  {phases}  {entry['nodes']:>8,} "
+          f"{memory / 2**20:>8.1f}  {entry['status']}")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0].strip(),
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--solvers', nargs='+', help=f'default: {" ".join(CREATORS + list(SOLVERS))}')
+    parser.add_argument('--puzzles', nargs='+', help='default: every crossword and kenken puzzle')
+    parser.add_argument('--repeat', type=int, default=3, help='timed runs per configuration (default 3)')
+    parser.add_argument('--deadline', type=float, default=10.0, help='seconds per phase (default 10)')
+    parser.add_argument('--output', help='write the results to this JSON file')
+    parser.add_argument('--baseline', help='compare with a stored results file; exit 1 on a regression')
+    parser.add_argument('--tolerance', type=float, default=0.25, help='allowed relative slow-down (default 0.25)')
+    parser.add_argument('--scaling', type=int, nargs='+', metavar='WORKERS',
+                        help='time the parallel solver with these worker counts instead')
+    args = parser.parse_args()
+
+    if args.scaling:
+        print(f'{os.cpu_count()} cores')
+        print(f"{'puzzle':>11} {'workers':>7}  {'median ms':>10}  {'speedup':>8}  {'tasks':>5} {'donations':>9}  status")
+        results = scaling(args.puzzles, args.scaling, args.repeat, report=_print_scaling)
+        if args.output:
+            Path(args.output).write_text(json.dumps(dict(meta=dict(cores=os.cpu_count()), scaling=results),
+                                                    indent=1))
+        return
+
+    print(f"{'puzzle':>11} {'solver':>14}  " + '  '.join(f'{phase[:10]:>10}' for phase in PHASES) +
+          f"  {'nodes':>8} {'peak MiB':>8}  status")
+    results = benchmark(args.solvers, args.puzzles, args.repeat, args.deadline, report=_print)
+    if args.output:
+        Path(args.output).write_text(json.dumps(results, indent=1))
+    if args.baseline:
+        found = regressions(json.loads(Path(args.baseline).read_text()), results, args.tolerance)
+        for line in found:
+            print(f'REGRESSION {line}')
+        if found:
+            sys.exit(1)
+        print(f'no regressions against {args.baseline}')
+
+if __name__ == "__main__":
+    main()
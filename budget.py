@@ -0,0 +1,169 @@
+''' Time, node and memory budgets for a search, checked at node boundaries.
+
+A search that runs over its Budget is unwound with BudgetExceeded and its entry
+point returns a BudgetExhausted instead of a solution: which limit ran out,
+and the statistics gathered so far. BudgetExhausted is falsy, so callers that
+test `if not assignment` treat it like "no solution found" unless they look.
+
+    budget = Budget(deadline=2.0, max_nodes=100_000, max_memory=512 * 2**20)
+    result = Solver(kenken, trail=True).solve(verbose=False, budget=budget)
+    creator = budgeted(CrosswordCreator)(crossword, budget=budget)
+    result = creator.solve()
+'''
+import os
+import sys
+import time
+from typing import NamedTuple, Optional
+
+try:
+    import resource
+except ImportError:     # not on Windows: memory ceilings are not enforced there
+    resource = None
+
+MEMORY_INTERVAL = 256   # checks between two peak-memory reads
+
+def peak_memory() -> Optional[int]:
+    ''' Peak resident set size of this process in bytes, if the platform reports it '''
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak if sys.platform == 'darwin' else peak * 1024
+
+def current_memory() -> Optional[int]:
+    ''' Resident set size of this process now, in bytes, where /proc reports it '''
+    try:
+        with open('/proc/self/statm') as statm:
+            return int(statm.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, IndexError):
+        return None
+
+class BudgetExhausted(NamedTuple):
+    reason: str                 # 'deadline', 'nodes' or 'memory'
+    nodes: int                  # nodes visited before stopping
+    elapsed: float              # seconds since the budget was started
+    memory: Optional[int]       # resident memory in bytes when stopping, if known
+    stats: Optional[dict] = None    # solver counters at the time of stopping
+
+    def __bool__(self):
+        return False
+
+class BudgetExceeded(Exception):
+    ''' Unwinds a search whose budget ran out; entry points turn it into a BudgetExhausted '''
+    def __init__(self, reason: str):
+        super().__init__(reason)
+        self.reason = reason
+
+class Budget:
+    ''' deadline in seconds from start(), max_nodes, max_memory in bytes; None = no limit.
+
+    max_memory caps the process's current resident memory. Without /proc (macOS,
+    Windows) only the peak is known, and it is only held against the limit once
+    it has grown since start(): a peak left by earlier work in a long-running
+    process says nothing about this search.
+    '''
+
+    def __init__(self, deadline: float = None, max_nodes: int = None, max_memory: int = None):
+        self.deadline = deadline
+        self.max_nodes = max_nodes
+        self.max_memory = max_memory
+        self.start()
+
+    def start(self) -> 'Budget':
+        self.started = time.perf_counter()
+        self.expires = None if self.deadline is None else self.started + self.deadline
+        self.nodes = 0
+        self.checks = 0
+        self.start_peak = peak_memory() if self.max_memory is not None else None
+        return self
+
+    def charge(self):
+        ''' Count one search node; raises BudgetExceeded if a limit has run out '''
+        if self.max_nodes is not None and self.nodes >= self.max_nodes:
+            raise BudgetExceeded('nodes')
+        self.nodes += 1
+        self.check()
+
+    def check(self):
+        ''' Deadline and memory only, for steps that are not search nodes (revisions) '''
+        if self.expires is not None and time.perf_counter() > self.expires:
+            raise BudgetExceeded('deadline')
+        if self.max_memory is not None:
+            self.checks += 1
+            if self.checks % MEMORY_INTERVAL == 1:
+                memory = self.memory()
+                if memory is not None and memory > self.max_memory:
+                    raise BudgetExceeded('memory')
+
+    def memory(self) -> Optional[int]:
+        ''' Memory held against max_memory, see the class docstring '''
+        memory = current_memory()
+        if memory is not None:
+            return memory
+        peak = peak_memory()
+        if peak is None or self.start_peak is None or peak <= self.start_peak:
+            return None
+        return peak
+
+    def exhausted(self, reason: str, stats: dict = None) -> BudgetExhausted:
+        memory = current_memory()
+        return BudgetExhausted(reason, self.nodes, time.perf_counter() - self.started,
+                               peak_memory() if memory is None else memory, dict(stats or {}))
+
+    def __repr__(self):
+        return f"Budget(deadline={self.deadline}, max_nodes={self.max_nodes}, max_memory={self.max_memory})"
+
+
+SEARCH_METHODS = ('backtrack', 'backtrack_ac3')  # the recursive entry points student creators use
+ENTRY_METHODS = ('solve', 'ac3') + SEARCH_METHODS
+
+def budgeted(creator):
+    ''' Returns a subclass of a CrosswordCreator (or a kenken_solver wrapper) whose
+    solve(), ac3() and backtrack entry points run under `budget`.
+
+    Each call of a search method counts as a node, which also covers the
+    recursive calls since they go through self; each revise() call checks the
+    deadline and memory, so a long ac3 is cut short too. The outermost entry
+    call starts the budget and turns BudgetExceeded into a BudgetExhausted.
+    '''
+    class BudgetedCreator(creator):
+        def __init__(self, *args, budget: Budget = None, **kwargs):
+            self.budget = budget
+            self._running = False
+            super().__init__(*args, **kwargs)
+
+        if hasattr(creator, 'revise'):
+            def revise(self, *args, **kwargs):
+                if self._running:
+                    self.budget.check()
+                return super().revise(*args, **kwargs)
+
+    def entry(name):
+        method = getattr(creator, name)
+        search = name in SEARCH_METHODS
+
+        def run(self, *args, **kwargs):
+            if self.budget is None:
+                return method(self, *args, **kwargs)
+            if self._running:
+                if search:
+                    self.budget.charge()
+                return method(self, *args, **kwargs)
+            self._running = True
+            self.budget.start()
+            try:
+                if search:
+                    self.budget.charge()
+                return method(self, *args, **kwargs)
+            except BudgetExceeded as exceeded:
+                stats = getattr(self, 'stats', None)     # creators that keep a SolverStats
+                return self.budget.exhausted(exceeded.reason, stats.as_dict() if stats is not None else None)
+            finally:
+                self._running = False
+        run.__name__ = name
+        run.__doc__ = method.__doc__
+        return run
+
+    for name in ENTRY_METHODS:
+        if hasattr(creator, name):
+            setattr(BudgetedCreator, name, entry(name))
+    return BudgetedCreator
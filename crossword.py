@@ -1,4 +1,5 @@
 import itertools
+from custom_classes import SparseOverlaps, ConstraintGraph
 class Variable():
     id_counter = itertools.count(0)
     ACROSS = "across"
@@ -106,26 +107,21 @@ class Crossword():
         # For any pair of variables v1, v2, their overlap is either:
         #    None, if the two variables do not overlap; or
         #    (i, j), where v1's ith character overlaps v2's jth character
-        self.overlaps = dict()
-        for v1 in self.variables:
-            for v2 in self.variables:
-                if v1 == v2:
-                    continue
-                cells1 = v1.cells
-                cells2 = v2.cells
-                intersection = set(cells1).intersection(cells2)
-                if not intersection:
-                    self.overlaps[v1, v2] = None
-                else:
-                    intersection = intersection.pop()
-                    self.overlaps[v1, v2] = (
-                        cells1.index(intersection),
-                        cells2.index(intersection)
-                    )
+        # Only pairs that share a cell are stored; looking up any other pair
+        # gives None. Cells are indexed first so that only variables crossing
+        # the same cell are compared.
+        by_cell = dict()
+        for v in self.variables:
+            for k, cell in enumerate(v.cells):
+                by_cell.setdefault(cell, []).append((v, k))
+        self.overlaps = SparseOverlaps()
+        for crossing in by_cell.values():
+            for v1, k1 in crossing:
+                for v2, k2 in crossing:
+                    if v1 != v2:
+                        self.overlaps[v1, v2] = (k1, k2)
+        self.graph = ConstraintGraph(self.variables, self.overlaps)
 
     def neighbors(self, var):
-        """Given a variable, return set of overlapping variables."""
-        return set(
-            v for v in self.variables
-            if v != var and self.overlaps[v, var]
-        )
+        """Given a variable, return the (frozen) set of overlapping variables."""
+        return self.graph.neighbors(var)
@@ -2,11 +2,10 @@ import sys
 
 from math import inf
 from crossword import *
+from solver_stats import SolverStats
 from copy import deepcopy
 from typing import *
 from custom_classes import Vector, VectorSlice, Overlap
-BACKTRACK_COUNTER = 0
-WORDS_TESTED = 0
 
 class CrosswordCreator():
 
@@ -19,6 +18,7 @@ class CrosswordCreator():
             var: self.crossword.words.copy()
             for var in self.crossword.variables
         }
+        self.stats = SolverStats()
 
     def letter_grid(self, assignment):
         """
@@ -93,14 +93,18 @@ class CrosswordCreator():
         """
         Enforce node and arc consistency, and then solve the CSP.
         """
-        self.enforce_node_consistency()
-        self.ac3()
-        if not interleaving:
-            print('Solving Crossword with single arc consistency enforcement...')
-            return self.backtrack(dict())
-        else:
-            print('Solving Crossword with interleaved backtracking and arc consistency enforcement...')
-            return self.backtrack_ac3(dict())
+        self.stats.reset()
+        with self.stats.phase('node_consistency'):
+            self.enforce_node_consistency()
+        with self.stats.phase('ac3'):
+            self.ac3()
+        with self.stats.phase('search'):
+            if not interleaving:
+                print('Solving Crossword with single arc consistency enforcement...')
+                return self.backtrack(dict())
+            else:
+                print('Solving Crossword with interleaved backtracking and arc consistency enforcement...')
+                return self.backtrack_ac3(dict())
 
     def enforce_node_consistency(self):
         """
@@ -300,9 +304,7 @@ class CrosswordCreator():
         If no assignment is possible, return None.
         """
 
-        global BACKTRACK_COUNTER
-        global WORDS_TESTED
-        BACKTRACK_COUNTER += 1
+        self.stats.node(len(assignment))
 
         # If all variables are assigned, return assignment:
         if self.assignment_complete(assignment):
@@ -312,11 +314,13 @@ class CrosswordCreator():
         var = self.select_unassigned_variable(assignment)
         for val in self.order_domain_values(var, assignment):
             assignment[var] = val
-            WORDS_TESTED += 1
+            self.stats.assignments += 1
             if self.consistent(assignment):
                 result = self.backtrack(assignment)
                 if result:
                     return result
+            else:
+                self.stats.failures += 1
             del assignment[var]
         return None
 
@@ -333,9 +337,7 @@ class CrosswordCreator():
         If no assignment is possible, return None.
         """
 
-        global BACKTRACK_COUNTER
-        global WORDS_TESTED
-        BACKTRACK_COUNTER += 1
+        self.stats.node(len(assignment))
 
         # If all variables are assigned, return assignment:
         if self.assignment_complete(assignment):
@@ -346,7 +348,7 @@ class CrosswordCreator():
         pre_assignment_domains = deepcopy(self.domains)
         for val in self.order_domain_values(var, assignment):
             assignment[var] = val
-            WORDS_TESTED += 1
+            self.stats.assignments += 1
             if self.consistent(assignment):
                 # Update variable domain to be assigned value
                 self.domains[var] = {val}
@@ -355,6 +357,8 @@ class CrosswordCreator():
                 result = self.backtrack_ac3(assignment)
                 if result:
                     return result
+            else:
+                self.stats.failures += 1
             # If assignment does not produce solution, remove assignment and reset domains
             del assignment[var]
             self.domains = pre_assignment_domains
@@ -381,8 +385,8 @@ def main():
     if assignment is None:
         print("No solution.")
     else:
-        print("Calls to backtrack function: ", BACKTRACK_COUNTER)
-        print("Words tested to find solution: ", WORDS_TESTED)
+        print("Calls to backtrack function: ", creator.stats.nodes)
+        print("Words tested to find solution: ", creator.stats.assignments)
         creator.print(assignment)
         if output:
             creator.save(assignment, output)
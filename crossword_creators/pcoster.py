@@ -2,10 +2,9 @@ import sys
 
 from math import inf
 from crossword import *
+from solver_stats import SolverStats
 from copy import deepcopy
 
-BACKTRACK_COUNTER = 0
-WORDS_TESTED = 0
 
 class CrosswordCreator():
 
@@ -18,6 +17,7 @@ class CrosswordCreator():
             var: self.crossword.words.copy()
             for var in self.crossword.variables
         }
+        self.stats = SolverStats()
 
     def letter_grid(self, assignment):
         """
@@ -92,14 +92,18 @@ class CrosswordCreator():
         """
         Enforce node and arc consistency, and then solve the CSP.
         """
-        self.enforce_node_consistency()
-        self.ac3()
-        if not interleaving:
-            print('Solving Crossword with single arc consistency enforcement...')
-            return self.backtrack(dict())
-        else:
-            print('Solving Crossword with interleaved backtracking and arc consistency enforcement...')
-            return self.backtrack_ac3(dict())
+        self.stats.reset()
+        with self.stats.phase('node_consistency'):
+            self.enforce_node_consistency()
+        with self.stats.phase('ac3'):
+            self.ac3()
+        with self.stats.phase('search'):
+            if not interleaving:
+                print('Solving Crossword with single arc consistency enforcement...')
+                return self.backtrack(dict())
+            else:
+                print('Solving Crossword with interleaved backtracking and arc consistency enforcement...')
+                return self.backtrack_ac3(dict())
 
     def enforce_node_consistency(self):
         """
@@ -154,11 +158,13 @@ class CrosswordCreator():
         """
         revision = False
         to_remove = set()
+        checks = 0
 
         # Iterate over domain of x and y, track any inconsistent x:
         for val_x in self.domains[x]:
             consistent = False
             for val_y in self.domains[y]:
+                checks += 1
                 # if self.overlap_satisfied(x,y, val_x, val_y):
                 if val_x != val_y and self.overlap_satisfied(x, y, val_x, val_y):
                     consistent = True
@@ -171,6 +177,9 @@ class CrosswordCreator():
         # Remove any domain variables that aren't arc consistent:
         self.domains[x] = self.domains[x] - to_remove
 
+        self.stats.revisions += 1
+        self.stats.checks += checks
+        self.stats.pruned += len(to_remove)
         return revision
 
     def ac3(self, arcs=None):
@@ -306,9 +315,7 @@ class CrosswordCreator():
         If no assignment is possible, return None.
         """
 
-        global BACKTRACK_COUNTER
-        global WORDS_TESTED
-        BACKTRACK_COUNTER += 1
+        self.stats.node(len(assignment))
 
         # If all variables are assigned, return assignment:
         if self.assignment_complete(assignment):
@@ -318,11 +325,13 @@ class CrosswordCreator():
         var = self.select_unassigned_variable(assignment)
         for val in self.order_domain_values(var, assignment):
             assignment[var] = val
-            WORDS_TESTED += 1
+            self.stats.assignments += 1
             if self.consistent(assignment):
                 result = self.backtrack(assignment)
                 if result:
                     return result
+            else:
+                self.stats.failures += 1
             del assignment[var]
         return None
 
@@ -339,9 +348,7 @@ class CrosswordCreator():
         If no assignment is possible, return None.
         """
 
-        global BACKTRACK_COUNTER
-        global WORDS_TESTED
-        BACKTRACK_COUNTER += 1
+        self.stats.node(len(assignment))
 
         # If all variables are assigned, return assignment:
         if self.assignment_complete(assignment):
@@ -352,7 +359,7 @@ class CrosswordCreator():
         pre_assignment_domains = deepcopy(self.domains)
         for val in self.order_domain_values(var, assignment):
             assignment[var] = val
-            WORDS_TESTED += 1
+            self.stats.assignments += 1
             if self.consistent(assignment):
                 # Update variable domain to be assigned value
                 self.domains[var] = {val}
@@ -361,6 +368,8 @@ class CrosswordCreator():
                 result = self.backtrack_ac3(assignment)
                 if result:
                     return result
+            else:
+                self.stats.failures += 1
             # If assignment does not produce solution, remove assignment and reset domains
             del assignment[var]
             self.domains = pre_assignment_domains
@@ -387,8 +396,8 @@ def main():
     if assignment is None:
         print("No solution.")
     else:
-        print("Calls to backtrack function: ", BACKTRACK_COUNTER)
-        print("Words tested to find solution: ", WORDS_TESTED)
+        print("Calls to backtrack function: ", creator.stats.nodes)
+        print("Words tested to find solution: ", creator.stats.assignments)
         creator.print(assignment)
         if output:
             creator.save(assignment, output)
@@ -1,6 +1,7 @@
 import numpy as np
 from typing import List, Tuple
 import itertools
+from collections.abc import Iterable, MutableSet
 
 class Overlap(np.ndarray):
     def __new__(cls, input_array: List[Tuple[int, int]]):
@@ -49,6 +50,109 @@ class Overlap(np.ndarray):
         memo[id(self)] = new_overlap  # Memoize the new object
         return new_overlap
 
+BATCH_CHUNK = 1 << 22    # max booleans per broadcast in supported()
+DEDUP_ROWS = 64          # dedupe projections only when a side has more rows than this
+
+def _distinct_rows(matrix):
+    ''' np.unique(matrix, axis=0, return_inverse=True) for small non-negative digits,
+    done on one packed integer per row (much faster than a row-wise unique) '''
+    shifts = 8 * np.arange(matrix.shape[1], dtype=np.int64)
+    if matrix.shape[1] > 8 or matrix.min(initial=0) < 0 or matrix.max(initial=0) > 255:
+        return np.unique(matrix, axis=0, return_inverse=True)
+    codes = (matrix.astype(np.int64) << shifts).sum(axis=1)
+    distinct, inverse = np.unique(codes, return_inverse=True)
+    return (distinct[:, None] >> shifts) & 255, inverse
+
+def supported(x_matrix, y_matrix, overlap) -> np.ndarray:
+    ''' Batched `vector1[position1] == vector2[position2]` over whole domains.
+
+    x_matrix and y_matrix hold one candidate vector per row; overlap is an
+    Overlap (or a plain list of (i, j) pairs). Returns a boolean array with one
+    entry per row of x_matrix: True when at least one row of y_matrix creates no
+    conflict with it at the overlap points, i.e. the row keeps an arc support.
+    On large domains only distinct projections onto the overlap positions are compared.
+    '''
+    x_matrix, y_matrix = np.asarray(x_matrix), np.asarray(y_matrix)
+    if len(y_matrix) == 0:
+        return np.zeros(len(x_matrix), dtype=bool)
+    pairs = np.asarray(overlap, dtype=int).reshape(-1, 2)
+    if len(pairs) == 0 or len(x_matrix) == 0:
+        return np.ones(len(x_matrix), dtype=bool)
+    xs, ys = x_matrix[:, pairs[:, 0]], y_matrix[:, pairs[:, 1]]
+    inverse = None
+    if len(xs) > DEDUP_ROWS:
+        xs, inverse = _distinct_rows(xs)
+    if len(ys) > DEDUP_ROWS:
+        ys, _ = _distinct_rows(ys)
+    result = np.empty(len(xs), dtype=bool)
+    step = max(1, BATCH_CHUNK // ys.size)
+    for start in range(0, len(xs), step):
+        conflict = (xs[start:start+step, None, :] == ys[None, :, :]).any(axis=2)
+        result[start:start+step] = ~conflict.all(axis=1)
+    return result if inverse is None else result[inverse.reshape(-1)]
+
+class SparseOverlaps(dict):
+    ''' Overlap map that only stores pairs that actually overlap.
+
+    Looking up any other pair returns None, as the dense maps used to, but
+    without inserting an entry (unlike defaultdict).
+    '''
+    def __missing__(self, key):
+        return None
+
+class ConstraintGraph:
+    ''' Neighbour index of a puzzle, built once from its overlap map.
+
+    Variables are numbered in `order`; the neighbours of variable i are
+    indices[indptr[i]:indptr[i+1]] (CSR layout) and degrees[i] is their count.
+    neighbors() hands out one cached frozenset per variable, so callers can
+    keep using set arithmetic such as `neighbors(x) - {y}`.
+    '''
+    def __init__(self, variables, overlaps):
+        self.order = list(variables)
+        self.index = {var: i for i, var in enumerate(self.order)}
+        adjacent = [set() for _ in self.order]
+        for (var1, var2), overlap in overlaps.items():
+            if overlap and var1 != var2:
+                adjacent[self.index[var1]].add(self.index[var2])
+                adjacent[self.index[var2]].add(self.index[var1])
+        self.degrees = np.array([len(a) for a in adjacent], dtype=np.int64)
+        self.indptr = np.concatenate(([0], np.cumsum(self.degrees)))
+        self.indices = np.array([j for a in adjacent for j in sorted(a)], dtype=np.int64)
+        self._neighbors = {var: frozenset(self.order[j] for j in adjacent[i])
+                           for i, var in enumerate(self.order)}
+
+    def neighbors(self, var) -> frozenset:
+        return self._neighbors[var]
+
+    def degree(self, var) -> int:
+        return int(self.degrees[self.index[var]])
+
+    def neighbor_indices(self, i: int) -> np.ndarray:
+        ''' Neighbours of the i_th variable, as a view into `indices` '''
+        return self.indices[self.indptr[i]:self.indptr[i + 1]]
+
+    def components(self) -> list:
+        ''' Connected components, as lists of variables in `order` '''
+        seen = np.zeros(len(self.order), dtype=bool)
+        components = []
+        for start in range(len(self.order)):
+            if seen[start]:
+                continue
+            seen[start] = True
+            members, frontier = [start], [start]
+            while frontier:
+                for j in self.neighbor_indices(frontier.pop()).tolist():
+                    if not seen[j]:
+                        seen[j] = True
+                        members.append(j)
+                        frontier.append(j)
+            components.append([self.order[i] for i in sorted(members)])
+        return components
+
+    def __len__(self):      return len(self.order)
+    def __repr__(self):     return f"ConstraintGraph({len(self.order)} variables, {len(self.indices) // 2} edges)"
+
 class VectorSlice(np.ndarray):
     id = itertools.count(0)
     def __new__(cls, input_data):
@@ -149,4 +253,158 @@ class Vector(np.ndarray):
         return self.shape[0]
 
     def __setitem__(self, key, value):
-        raise TypeError("Vector instances are immutable")
\ No newline at end of file
+        raise TypeError("Vector instances are immutable")
+
+class DomainTable:
+    ''' The immutable half of a DomainStore: every candidate of one cage.
+
+    Candidates live in a single int8 matrix (one row each). The objects handed
+    to solver code (Vector or tuple) are only built when a row is first read,
+    and are shared by every DomainStore that views this table, so a candidate
+    keeps its identity across copies.
+    '''
+    def __init__(self, matrix, wrap=Vector):
+        self.matrix = np.ascontiguousarray(matrix, dtype=np.int8)
+        self.matrix.setflags(write=False)
+        self.wrap = wrap
+        self.values = np.empty(len(self.matrix), dtype=object)
+        self._unbuilt = np.ones(len(self.matrix), dtype=bool)
+        self._n_unbuilt = len(self.matrix)
+        self._by_id = {}        # Vector.id -> row
+        self._by_content = None # tuple -> row, built on first lookup
+
+    def value(self, row):
+        if self._unbuilt[row]:
+            v = self.values[row] = self.wrap(self.matrix[row].tolist())
+            self._unbuilt[row] = False
+            self._n_unbuilt -= 1
+            if isinstance(v, Vector):
+                self._by_id[v.id] = row
+        return self.values[row]
+
+    def values_where(self, mask):
+        ''' Candidates of the rows selected by a boolean mask, building any never read '''
+        if self._n_unbuilt:
+            for row in np.flatnonzero(mask & self._unbuilt).tolist():
+                self.value(row)
+        return self.values[mask].tolist()
+
+    def row_of(self, value):
+        ''' Row index of `value`, or None if it is not a candidate of this table '''
+        if self.wrap is Vector:
+            return self._by_id.get(value.id) if isinstance(value, Vector) else None
+        if self._by_content is None:
+            self._by_content = {tuple(r): i for i, r in enumerate(self.matrix.tolist())}
+        try:
+            return self._by_content.get(tuple(value))
+        except TypeError:
+            return None
+
+    def __len__(self):
+        return len(self.matrix)
+
+
+class DomainStore(MutableSet):
+    ''' Set-like view of a cage domain backed by a DomainTable and an alive mask.
+
+    Behaves like the `set` of Vectors it replaces (iteration, `in`, `remove`,
+    `-`, `-=`, `copy`, ...), but removing a candidate only flips a boolean and
+    copying (including `copy.deepcopy`) copies the mask, not the candidates.
+    '''
+    def __init__(self, table, alive=None):
+        if not isinstance(table, DomainTable):
+            table = DomainTable(table)
+        self._table = table
+        self._alive = np.ones(len(table), dtype=bool) if alive is None else alive
+        self._size = int(np.count_nonzero(self._alive))
+
+    @classmethod
+    def _from_iterable(cls, iterable):
+        # results of |, ^ may hold foreign values, so fall back to a plain set
+        return set(iterable)
+
+    # --- array access ---
+    @property
+    def table(self):          return self._table
+    @property
+    def matrix(self):         return self._table.matrix
+    @property
+    def alive(self):          return self._alive
+    def rows(self):           return self._alive.nonzero()[0]
+    def value(self, row):     return self._table.value(row)
+    def row_of(self, value):  return self._table.row_of(value)
+
+    def discard_row(self, row):
+        ''' Mark `row` dead. Returns True if it was alive. '''
+        if self._alive[row]:
+            self._alive[row] = False
+            self._size -= 1
+            return True
+        return False
+
+    def restore_row(self, row):
+        if not self._alive[row]:
+            self._alive[row] = True
+            self._size += 1
+
+    def _rows_in(self, values):
+        if isinstance(values, DomainStore) and values._table is self._table:
+            return values._alive
+        rows = [self._table.row_of(v) for v in values]
+        return [r for r in rows if r is not None]
+
+    # --- set protocol ---
+    def __contains__(self, value):
+        row = self._table.row_of(value)
+        return row is not None and bool(self._alive[row])
+
+    def __iter__(self):
+        return iter(self._table.values_where(self._alive))
+
+    def __len__(self):
+        return self._size
+
+    def add(self, value):
+        row = self._table.row_of(value)
+        if row is None:
+            raise ValueError(f'{value!r} is not a candidate of this domain')
+        self.restore_row(row)
+
+    def discard(self, value):
+        row = self._table.row_of(value)
+        if row is not None:
+            self.discard_row(row)
+
+    def __sub__(self, other):
+        if not isinstance(other, Iterable):
+            return NotImplemented
+        result = self.copy()
+        result -= other
+        return result
+
+    def __isub__(self, other):
+        mask = np.zeros_like(self._alive)
+        mask[self._rows_in(other)] = True
+        self._alive &= ~mask
+        self._size = int(np.count_nonzero(self._alive))
+        return self
+
+    def __and__(self, other):
+        if not isinstance(other, Iterable):
+            return NotImplemented
+        mask = np.zeros_like(self._alive)
+        mask[self._rows_in(other)] = True
+        return DomainStore(self._table, self._alive & mask)
+    __rand__ = __and__
+
+    def copy(self):
+        return DomainStore(self._table, self._alive.copy())
+
+    def __copy__(self):
+        return self.copy()
+
+    def __deepcopy__(self, memo):
+        return self.copy()
+
+    def __repr__(self):
+        return f"DomainStore({self._size}/{len(self._table)} alive)"
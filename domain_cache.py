@@ -0,0 +1,113 @@
+import os
+import sqlite3
+from collections import OrderedDict
+from pathlib import Path
+from typing import Callable, Iterable, Optional, Tuple
+
+import numpy as np
+
+DOMAIN_VERSION = 1  # bump whenever cage domain generation changes, so stored rows are not reused
+
+class DomainCache:
+    ''' Content-addressed store of cage domains.
+
+    A cage domain depends only on the operator, the target, the puzzle size N
+    and the shape of the cage, so the same cage found in two puzzles (or in
+    two loads of the same puzzle) shares one entry. Domains are kept as int8
+    matrices, one row per candidate vector, in an in-memory LRU in front of
+    an optional sqlite file.
+    '''
+    def __init__(self, path: Optional[os.PathLike] = None, maxsize: int = 4096):
+        self.path = Path(path) if path is not None else None
+        self.maxsize = maxsize
+        self._lru: OrderedDict = OrderedDict()
+        self._conn = None
+        self._pid = None
+        self.hits = self.misses = 0
+
+    @staticmethod
+    def key(op: str, target: int, cells: Iterable[Tuple[int, int]], N: int) -> str:
+        ''' Cache key: the cage shape is translated to the origin, cell order is kept.
+        Keys carry DOMAIN_VERSION, so rows stored by an older generator are never read. '''
+        cells = list(cells)
+        r0 = min(r for r, _ in cells)
+        c0 = min(c for _, c in cells)
+        shape = ';'.join(f'{r - r0},{c - c0}' for r, c in cells)
+        return f'v{DOMAIN_VERSION}|{op}|{target}|{N}|{shape}'
+
+    def _connection(self):
+        # sqlite connections must not cross a fork, so reopen per process
+        if self.path is None:
+            return None
+        if self._conn is None or self._pid != os.getpid():
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            self._conn = sqlite3.connect(str(self.path))
+            self._conn.execute('CREATE TABLE IF NOT EXISTS domains '
+                               '(key TEXT PRIMARY KEY, width INTEGER, data BLOB)')
+            self._pid = os.getpid()
+        return self._conn
+
+    def _remember(self, key: str, matrix: np.ndarray):
+        self._lru[key] = matrix
+        self._lru.move_to_end(key)
+        if len(self._lru) > self.maxsize:
+            self._lru.popitem(last=False)
+
+    def get(self, key: str) -> Optional[np.ndarray]:
+        if key in self._lru:
+            self._lru.move_to_end(key)
+            return self._lru[key]
+        conn = self._connection()
+        if conn is None:
+            return None
+        row = conn.execute('SELECT width, data FROM domains WHERE key = ?', (key,)).fetchone()
+        if row is None:
+            return None
+        width, data = row
+        matrix = np.frombuffer(data, dtype=np.int8).reshape(-1, width)
+        self._remember(key, matrix)
+        return matrix
+
+    def put(self, key: str, matrix: np.ndarray):
+        matrix = np.ascontiguousarray(matrix, dtype=np.int8)
+        matrix.setflags(write=False)
+        self._remember(key, matrix)
+        conn = self._connection()
+        if conn is not None:
+            with conn:
+                conn.execute('INSERT OR REPLACE INTO domains VALUES (?, ?, ?)',
+                             (key, matrix.shape[1], matrix.tobytes()))
+
+    def get_or_compute(self, key: str, compute: Callable[[], np.ndarray]) -> np.ndarray:
+        matrix = self.get(key)
+        if matrix is not None:
+            self.hits += 1
+            return matrix
+        self.misses += 1
+        matrix = np.ascontiguousarray(compute(), dtype=np.int8)
+        self.put(key, matrix)
+        return matrix
+
+    def clear(self):
+        self._lru.clear()
+        conn = self._connection()
+        if conn is not None:
+            with conn:
+                conn.execute('DELETE FROM domains')
+
+    def __len__(self):        return len(self._lru)
+    def __repr__(self):       return f"DomainCache({self.path}, {len(self)} in memory)"
+
+
+_default_cache = None
+def default_cache() -> DomainCache:
+    ''' Process-wide cache used by Kenken.
+
+    In memory only, unless KENKEN_DOMAIN_CACHE names a sqlite file to keep
+    domains in between runs (e.g. ~/.cache/overload_challenge/cage_domains.sqlite).
+    '''
+    global _default_cache
+    if _default_cache is None:
+        path = os.environ.get('KENKEN_DOMAIN_CACHE')
+        _default_cache = DomainCache(os.path.expanduser(path) if path else None)
+    return _default_cache
@@ -0,0 +1,98 @@
+''' Generalised arc consistency for all-different (Régin, 1994).
+
+Pairwise overlaps only ever compare two cages at a time, so they cannot see
+pigeonhole facts such as "two cells of this row are limited to {1, 2}, so no
+other cell of the row can hold 1 or 2". Régin's filter can: a digit is kept
+for a cell iff some maximum matching of cells to digits uses that edge.
+'''
+from typing import Dict, List, Optional, Set, Tuple
+
+def maximum_matching(domains: List[Set[int]]) -> Dict[int, int]:
+    ''' Cell index -> digit, by augmenting paths (Kuhn). Domains here hold at most ~12 digits. '''
+    owner: Dict[int, int] = {}   # digit -> cell
+
+    def augment(cell, seen):
+        for digit in domains[cell]:
+            if digit in seen:
+                continue
+            seen.add(digit)
+            if digit not in owner or augment(owner[digit], seen):
+                owner[digit] = cell
+                return True
+        return False
+
+    for cell in range(len(domains)):
+        augment(cell, set())
+    return {cell: digit for digit, cell in owner.items()}
+
+def _strongly_connected(nodes, edges) -> Dict:
+    ''' Tarjan's algorithm; returns node -> component id '''
+    index, low, component = {}, {}, {}
+    stack, on_stack = [], set()
+    counter = [0]
+
+    def visit(node):
+        index[node] = low[node] = counter[0]; counter[0] += 1
+        stack.append(node); on_stack.add(node)
+        for succ in edges.get(node, ()):
+            if succ not in index:
+                visit(succ)
+                low[node] = min(low[node], low[succ])
+            elif succ in on_stack:
+                low[node] = min(low[node], index[succ])
+        if low[node] == index[node]:
+            while True:
+                member = stack.pop(); on_stack.discard(member)
+                component[member] = node
+                if member == node:
+                    break
+
+    for node in nodes:
+        if node not in index:
+            visit(node)
+    return component
+
+def alldiff_prune(domains: List[Set[int]]) -> Optional[List[Tuple[int, int]]]:
+    ''' (cell, digit) pairs that belong to no solution of all-different(domains).
+
+    Returns None if the cells cannot all take different digits.
+    Matched edges are oriented digit -> cell and the others cell -> digit; an
+    unmatched edge survives if it lies on an alternating cycle (both ends in one
+    strongly connected component) or leads to a digit from which a free digit
+    can be reached along an alternating path.
+    '''
+    matching = maximum_matching(domains)
+    if len(matching) < len(domains):
+        return None
+
+    cells = [('cell', i) for i in range(len(domains))]
+    digits = {('digit', d) for domain in domains for d in domain}
+    edges: Dict = {}
+    reverse: Dict = {}
+    for i, domain in enumerate(domains):
+        for d in domain:
+            a, b = (('digit', d), ('cell', i)) if matching[i] == d else (('cell', i), ('digit', d))
+            edges.setdefault(a, []).append(b)
+            reverse.setdefault(b, []).append(a)
+
+    # nodes that can reach a free (unmatched) digit
+    matched = set(matching.values())
+    frontier = [node for node in digits if node[1] not in matched]
+    reaches_free = set(frontier)
+    while frontier:
+        node = frontier.pop()
+        for pred in reverse.get(node, ()):
+            if pred not in reaches_free:
+                reaches_free.add(pred)
+                frontier.append(pred)
+
+    component = _strongly_connected(cells + sorted(digits), edges)
+    removals = []
+    for i, domain in enumerate(domains):
+        for d in domain:
+            digit = ('digit', d)
+            if matching[i] == d or digit in reaches_free:
+                continue
+            if component[('cell', i)] != component[digit]:
+                removals.append((i, d))
+    return removals
@@ -0,0 +1,166 @@
+''' Cell-level KenKen model: one variable per cell instead of one per cage.
+
+Cell domains are bitmasks over the digits 1..N (bit d set = digit d allowed),
+each cage is a table constraint over its cells whose allowed tuples are the
+cage's domain vectors, enforced by Compact-Table, and every row and column is
+an all-different constraint (generic_alldiff).
+'''
+from typing import Dict, List, Optional, Tuple
+import numpy as np
+from generic_alldiff import alldiff_prune
+
+def digits_of(mask: int) -> List[int]:
+    ''' The digits set in a domain bitmask, ascending '''
+    digits = []
+    while mask:
+        low = mask & -mask
+        digits.append(low.bit_length() - 1)
+        mask ^= low
+    return digits
+
+def _bitset(flags: np.ndarray) -> int:
+    ''' bool array -> python int with bit i set where flags[i] '''
+    return int.from_bytes(np.packbits(flags, bitorder='little').tobytes(), 'little')
+
+
+class CompactTable:
+    ''' Compact-Table propagator (Demeulenaere et al., 2016) for one cage.
+
+    `current` is a bitset over the cage's tuples that are still valid, and
+    supports[pos][d] the bitset of tuples with digit d at position pos. An
+    update ANDs out the tuples of removed digits (or keeps only the tuples of
+    the remaining digits, whichever touches fewer words), and filtering keeps
+    a digit iff its supports still intersect `current`.
+    '''
+    def __init__(self, scope: List[int], matrix: np.ndarray, N: int):
+        self.scope = scope
+        self.supports = [[_bitset(matrix[:, pos] == d) for d in range(N + 1)]
+                         for pos in range(len(scope))]
+        self.current = (1 << len(matrix)) - 1
+        self.last: List[Optional[int]] = [None] * len(scope)   # domains seen by the last update
+
+    def propagate(self, domains: List[int]) -> Optional[List[int]]:
+        ''' Filter the scope's domains in place; returns the changed cells, or None on a wipeout '''
+        current = self.current
+        for pos, cell in enumerate(self.scope):
+            dom, last = domains[cell], self.last[pos]
+            if dom == last:
+                continue
+            supports = self.supports[pos]
+            removed = None if last is None else last & ~dom
+            if removed is not None and removed.bit_count() < dom.bit_count():
+                mask = 0
+                for d in digits_of(removed):
+                    mask |= supports[d]
+                current &= ~mask
+            else:
+                mask = 0
+                for d in digits_of(dom):
+                    mask |= supports[d]
+                current &= mask
+        self.current = current
+        if not current:
+            return None
+        changed = []
+        for pos, cell in enumerate(self.scope):
+            dom, supports, kept = domains[cell], self.supports[pos], 0
+            for d in digits_of(dom):
+                if supports[d] & current:
+                    kept |= 1 << d
+            if kept != dom:
+                domains[cell] = kept
+                changed.append(cell)
+            self.last[pos] = kept
+        return changed
+
+
+class CellModel:
+    ''' A Kenken recast with one variable per cell '''
+
+    def __init__(self, kenken):
+        self.kenken = kenken
+        N = self.N = kenken.N
+        self.cells: List[Tuple[int, int]] = [(r, c) for r in range(N) for c in range(N)]
+        index = {cell: i for i, cell in enumerate(self.cells)}
+        self.domains: List[int] = [((1 << N) - 1) << 1] * len(self.cells)
+        self.tables = [CompactTable([index[cell] for cell in cage.cells], cage.domain.matrix, N)
+                       for cage in kenken.cages]
+        self.units = [[index[r, c] for c in range(N)] for r in range(N)] + \
+                     [[index[r, c] for r in range(N)] for c in range(N)]
+        # constraint ids: 0..T-1 are tables, T.. are units
+        self.constraints_of: List[List[int]] = [[] for _ in self.cells]
+        for t, table in enumerate(self.tables):
+            for cell in table.scope:
+                self.constraints_of[cell].append(t)
+        for u, unit in enumerate(self.units):
+            for cell in unit:
+                self.constraints_of[cell].append(len(self.tables) + u)
+        self.nodes = 0
+        self.propagations = 0
+
+    def _propagate_unit(self, unit: List[int]) -> Optional[List[int]]:
+        removals = alldiff_prune([set(digits_of(self.domains[cell])) for cell in unit])
+        if removals is None:
+            return None
+        changed = []
+        for i, d in removals:
+            cell = unit[i]
+            self.domains[cell] &= ~(1 << d)
+            changed.append(cell)
+        return changed
+
+    def propagate(self, queue=None) -> bool:
+        ''' Run table and all-different propagators to a fixpoint. False on a wipeout. '''
+        T = len(self.tables)
+        pending = set(range(T + len(self.units))) if queue is None else set(queue)
+        while pending:
+            c = pending.pop()
+            self.propagations += 1
+            if c < T:
+                changed = self.tables[c].propagate(self.domains)
+            else:
+                changed = self._propagate_unit(self.units[c - T])
+            if changed is None:
+                return False
+            for cell in changed:
+                if not self.domains[cell]:
+                    return False
+                pending.update(self.constraints_of[cell])
+        return True
+
+    def _save(self):
+        return (list(self.domains), [(t.current, list(t.last)) for t in self.tables])
+
+    def _restore(self, state):
+        domains, tables = state
+        self.domains = list(domains)
+        for table, (current, last) in zip(self.tables, tables):
+            table.current, table.last = current, list(last)
+
+    def search(self) -> bool:
+        self.nodes += 1
+        unfixed = [(self.domains[i].bit_count(), i) for i in range(len(self.cells))
+                   if self.domains[i] & (self.domains[i] - 1)]
+        if not unfixed:
+            return True
+        _, cell = min(unfixed)
+        state = self._save()
+        for d in digits_of(self.domains[cell]):
+            self.domains[cell] = 1 << d
+            if self.propagate(self.constraints_of[cell]) and self.search():
+                return True
+            self._restore(state)
+        return False
+
+    def solve(self) -> Optional[Dict]:
+        ''' Solve and return a cage-level assignment {cage: vector}, or None '''
+        if not (self.propagate() and self.search()):
+            return None
+        return self.assignment()
+
+    def assignment(self) -> Dict:
+        grid = {cell: digits_of(self.domains[i])[0] for i, cell in enumerate(self.cells)}
+        return {cage: tuple(grid[cell] for cell in cage.cells) for cage in self.kenken.cages}
+
+    def __repr__(self):
+        return f"CellModel({self.N}x{self.N}, {len(self.tables)} tables, {len(self.units)} all-different)"
@@ -2,10 +2,11 @@ import itertools
 import math
 
 from collections import defaultdict
-from functools import cache
-import ast
 import numpy as np
-from typing import List, Tuple, Set, Dict
+from typing import List, Tuple, Set, Dict, FrozenSet
+from domain_cache import default_cache
+from custom_classes import DomainStore, DomainTable, SparseOverlaps, ConstraintGraph
+from kenken import candidate_vectors, overlap_points, read_structure
 
 Vector = Tuple[int,...]
 Domain = Set[Vector]
@@ -19,20 +20,31 @@ OP_FUNC = { ADD:   sum,
 class Cage:
     ''' This class replaces Crossword's Variable class '''
     id_generator = itertools.count(0)
-    def __init__(self, op, target, cells, N):
+    def __init__(self, op, target, cells, N, cache=None):
         self.id = next(Cage.id_generator)
         self.target = target
         self.cells = cells
         self.N = N
         self.op = op
-        self.set_initial_domain_()
+        self.set_initial_domain_(cache)
 
-    def set_initial_domain_(self):
+    def set_initial_domain_(self, cache=None):
         '''In-place operation 
 
         In Crossword's Variable class, we explore all possible words that might
         fit.  Here, we explore all possible integer tuples (vectors).
+        With a DomainCache, the vectors are looked up by (op, target, N, shape)
+        and only computed on a miss.
         '''
+        if cache is None:
+            rows = self._domain_matrix()
+        else:
+            key = cache.key(self.op, self.target, self.cells, self.N)
+            rows = cache.get_or_compute(key, self._domain_matrix)
+        self.domain: Domain = DomainStore(DomainTable(rows, tuple))
+
+    def _domain_matrix(self):
+        ''' All candidate vectors as an int8 matrix, one row per vector '''
         op: str = self.op; 
         N: int = self.N
         target: int = self.target
@@ -45,16 +57,8 @@ class Cage:
                         for n2 in range(1, N+1)
                         if OP_FUNC[op](n1,n2) == target and n1 != n2}
         else: # op in (ADD, MULT)
-            rows_occupied, cols_occupied = zip(*self.cells)
-            max_duplicates: int = min(len(set(rows_occupied)), len(set(cols_occupied)))
-            digit_pool = list(range(1, N+1)) * max_duplicates
-            domain: Domain = {
-                  permutation # type Tuple
-                  for permutation in itertools.permutations(digit_pool, len(self.cells))
-                  if self._row_column_constraint_satisfied(permutation)
-                     and OP_FUNC[op](permutation) == self.target}
-        
-        self.domain: Domain = domain
+            domain: Domain = set(candidate_vectors(op, target, self.cells, N))
+        return np.array(sorted(domain), dtype=np.int8).reshape(-1, len(self.cells))
     
     def _row_column_constraint_satisfied(self, perm:Tuple) -> bool:
         rows, cols = defaultdict(set), defaultdict(set)
@@ -73,23 +77,23 @@ class Cage:
     def length(self) -> int : # Required: used by crossword solver
         return self.__len__()  
     def __hash__(self):         return hash(self.id)
-    def __eq__(self, other):    return self.id == other.id
+    def __eq__(self, other):    return isinstance(other, Cage) and self.id == other.id   # never a Vector with the same id
     def __len__(self):          return len(self.cells)
     def __repr__(self):         return f"{self.id}:{self.op}, {self.target}, {self.cells})" 
     def __str__(self):          return self.__repr__()
     def __copy__(self):         return self
+    def __deepcopy__(self, memo): return self
 
 Overlaps = Dict[Tuple[Cage, Cage], Overlap]
+POPCOUNT = np.array([bin(byte).count('1') for byte in range(256)], dtype=np.uint8)
+COMPILE_CHUNK = 1 << 24     # max booleans per broadcast while compiling
+
 class Kenken:
     """ A class to represent a Kenken puzzle as a list of cages """
     
-    def __init__(self, structure_file, word_file=None):
-        self.structure = []
-        with open(structure_file,'r') as f:
-            for line in f:
-                op, target, cells = ast.literal_eval(line)
-                op = {'/':'÷','*':'x',' ':'='}.get(op, op)
-                self.structure.append((op, target, cells))
+    def __init__(self, structure_file, word_file=None, cache=None):
+        ''' `cache` is a DomainCache for cage domains; defaults to domain_cache.default_cache() '''
+        self.structure = read_structure(structure_file)
     
         # get the dimension of the puzzle -- 
         self.N = 1 + max(row 
@@ -98,7 +102,8 @@ class Kenken:
 
         # Build cages
         Cage.id_generator = itertools.count(0)
-        self.cages = [Cage(op=op, target=target, cells=cells, N=self.N)
+        cache = default_cache() if cache is None else cache
+        self.cages = [Cage(op=op, target=target, cells=cells, N=self.N, cache=cache)
                       for (op, target, cells) in self.structure]
         
         self.words = set()  # required during CrosswordCreator initialization
@@ -117,27 +122,71 @@ class Kenken:
 
         Here, we wrap the output in a custom class, Overlap. See write-up for details
         '''
-        from collections import defaultdict
-        self.overlaps:Overlaps_Dict = defaultdict(lambda: None)
-        for cage1 in self.cages:
-            for cage2 in self.cages:
-                if cage1 != cage2:  # Don't compute overlaps with self
-                    overlap_pts:Overlap = []
-                    for position1, cell1 in enumerate(cage1.cells):
-                        for position2, cell2 in enumerate(cage2.cells):
-                            if cell1[0] == cell2[0] or cell1[1] == cell2[1]:
-                                overlap_pts.append((position1, position2))
-                    if overlap_pts != []:
-                        self.overlaps[(cage1, cage2)] = overlap_pts
-
-    @cache
-    def neighbors(self, cage:Cage) -> Set[Cage]:
-        """Given a cage, return set of overlapping cages."""
-        return {
-            other_cage for other_cage in self.cages
-            if cage != other_cage and
-                self.overlaps[cage, other_cage]
-            }
+        self.overlaps: Overlaps = SparseOverlaps(overlap_points(self.cages))
+        self.graph = ConstraintGraph(self.cages, self.overlaps)
+
+        # rows and columns as lists of (cage, position) cells, for all-different propagation
+        self.units: List[List[Tuple[Cage, int]]] = [[] for _ in range(2 * self.N)]
+        for cage in self.cages:
+            for position, (row, col) in enumerate(cage.cells):
+                self.units[row].append((cage, position))
+                self.units[self.N + col].append((cage, position))
+        self.units_of: Dict[Cage, List[int]] = defaultdict(list)
+        for u, unit in enumerate(self.units):
+            for cage in {cage for cage, _ in unit}:
+                self.units_of[cage].append(u)
+
+        self.compat = None  # filled by compile()
+
+    def compile(self):
+        ''' Precompute which domain rows of every overlapping cage pair are compatible.
+
+        compat[cage1, cage2] is a packed bit-matrix over the rows of the two cages'
+        domain tables: bit (i, j) is set when row i of cage1 and row j of cage2
+        differ at every overlap position. Each pair is one NumPy broadcast
+        (chunked for large cages). Afterwards is_consistent is a bit lookup, and
+        supported()/support_counts() answer a whole revise with row-wise ANDs.
+        '''
+        if self.compat is not None:
+            return self.compat
+        compat = {}
+        for (cage1, cage2), overlap in list(self.overlaps.items()):
+            if overlap is None or (cage1, cage2) in compat:
+                continue
+            positions1, positions2 = map(list, zip(*overlap))
+            a = cage1.domain.matrix[:, positions1]
+            b = cage2.domain.matrix[:, positions2]
+            ok = np.empty((len(a), len(b)), dtype=bool)
+            step = max(1, COMPILE_CHUNK // max(1, b.size))
+            for start in range(0, len(a), step):
+                ok[start:start+step] = ~(a[start:start+step, None, :] == b[None, :, :]).any(axis=2)
+            compat[cage1, cage2] = np.packbits(ok, axis=1)
+            compat[cage2, cage1] = np.packbits(ok.T, axis=1)
+        self.compat = compat
+        return compat
+
+    def supported(self, var1: Cage, var2: Cage, rows1: np.ndarray, alive2: np.ndarray) -> np.ndarray:
+        ''' For each row in rows1, whether any alive row of var2 supports it (needs compile()) '''
+        bits = self.compat.get((var1, var2))
+        if bits is None:
+            return np.ones(len(rows1), dtype=bool)
+        return (bits[rows1] & np.packbits(alive2)).any(axis=1)
+
+    def compatible(self, var1: Cage, var2: Cage, row1: int, row2: int) -> bool:
+        ''' is_consistent for two domain rows, as a bit lookup (needs compile()) '''
+        bits = self.compat.get((var1, var2))
+        return bits is None or bool(bits[row1, row2 >> 3] & (0x80 >> (row2 & 7)))
+
+    def support_counts(self, var1: Cage, var2: Cage, rows1: np.ndarray, alive2: np.ndarray) -> np.ndarray:
+        ''' For each row in rows1, how many alive rows of var2 support it (needs compile()) '''
+        bits = self.compat.get((var1, var2))
+        if bits is None:
+            return np.full(len(rows1), np.count_nonzero(alive2))
+        return POPCOUNT[bits[rows1] & np.packbits(alive2)].sum(axis=1, dtype=np.int64)
+
+    def neighbors(self, cage:Cage) -> FrozenSet[Cage]:
+        """Given a cage, return the (frozen) set of overlapping cages."""
+        return self.graph.neighbors(cage)
 
     def is_consistent(self, var1: 'Cage', var2: 'Cage', vector1: Vector, vector2: Vector) -> bool:
         ''' Returns True if vector1 and vector2 are consistent with each other.
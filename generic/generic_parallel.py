@@ -0,0 +1,248 @@
+''' Split the cage-level search across processes.
+
+The parent propagates at the root and expands the top of the search tree
+breadth first until there are `split` subproblems per worker. A subproblem is
+a partial assignment plus the domains reached by propagating it, and travels
+compactly: decisions as (cage index, row) pairs and every domain's alive mask
+packed into bits, rather than pickled DomainStores.
+
+Workers run backtrack_iterative on one subproblem at a time. Whenever a worker
+sits idle with nothing queued, a busy worker gives away the untried values of
+its shallowest open level (work stealing by donation), so one hard subtree
+does not leave the other cores waiting. The first solution stops everyone.
+
+Near-linear scaling with the worker count is the goal, but it is unverified:
+this was developed on a single core, where only correctness could be tested.
+`python benchmark.py --scaling 1 2 4 8` reports the speedup per worker count
+to check it on multi-core hardware.
+'''
+import multiprocessing as mp
+import queue as queues
+import time
+from typing import List, Optional, Sequence, Tuple
+import numpy as np
+from custom_classes import DomainStore
+from generic_kenken import Kenken as CSP
+from generic_solver import Solver, RESTART
+
+Literals = Tuple[Tuple[int, int], ...]   # decisions as (cage index, row)
+Task = Tuple[Literals, bytes, Optional[Tuple[int, int]]]   # (decisions, domains, value to try first)
+POLL = 1.0      # seconds between checks that the workers are still alive
+
+def encode_domains(alive: Sequence[np.ndarray]) -> bytes:
+    ''' Alive masks, in cage order, packed into one bytes object '''
+    return b''.join(np.packbits(mask).tobytes() for mask in alive)
+
+def decode_domains(cages: Sequence, blob: bytes) -> List[np.ndarray]:
+    ''' Inverse of encode_domains '''
+    bits = np.unpackbits(np.frombuffer(blob, dtype=np.uint8))
+    masks, offset = [], 0
+    for cage in cages:
+        n = len(cage.domain.table)
+        masks.append(bits[offset:offset + n].astype(bool))
+        offset += (n + 7) // 8 * 8
+    return masks
+
+
+class ParallelSolver:
+    ''' Solver.solve on `workers` processes; options go to each worker's Solver '''
+
+    def __init__(self, csp: CSP, workers: int = None, split: int = 4, **options):
+        assert not {'trail', 'iterative'} & set(options), 'workers always run the iterative trail engine'
+        assert options.get('lcv', 'scan') == 'scan' and not options.get('cbj') and not options.get('restarts'), \
+            'counted lcv, cbj and restarts keep search state that does not split'
+        self.csp = csp
+        self.cages = list(csp.cages)
+        self.index = {cage: i for i, cage in enumerate(self.cages)}
+        self.workers = workers or mp.cpu_count()
+        self.split = split
+        self.options = options
+        self.tasks = 0        # subproblems run, including donated ones
+        self.donations = 0    # times a worker gave work away
+        self.nodes = 0        # nodes over all workers
+
+    def solver(self) -> Solver:
+        return Solver(self.csp, trail=True, iterative=True, **self.options)
+
+    def load(self, solver: Solver, literals: Literals, blob: bytes) -> dict:
+        ''' Put `solver` in the state of a subproblem; returns its assignment '''
+        for cage, mask in zip(self.cages, decode_domains(self.cages, blob)):
+            solver.domains[cage] = DomainStore(cage.domain.table, mask)
+        solver.trail.clear()
+        assignment = {self.cages[i]: self.cages[i].domain.value(row) for i, row in literals}
+        if solver.order is not None:
+            solver.order.sync(((var, len(domain)) for var, domain in solver.domains.items()), assignment)
+            solver.resized.clear()
+        return assignment
+
+    def snapshot(self, solver: Solver, assignment: dict) -> Tuple[Literals, bytes]:
+        return (self.literals(assignment),
+                encode_domains([solver.domains[cage].alive for cage in self.cages]))
+
+    def literals(self, assignment: dict) -> Literals:
+        return tuple((self.index[var], var.domain.row_of(val)) for var, val in assignment.items())
+
+    def frontier(self) -> Tuple[Optional[dict], List[Task]]:
+        ''' Root propagation and breadth-first expansion. Returns (solution, []) if
+        the top of the tree already holds one, (None, []) if there is none. '''
+        solver = self.solver()
+        solver.enforce_node_consistency()
+        if not solver.propagate():
+            return None, []
+        nodes = [self.snapshot(solver, {})]
+        target = self.split * self.workers
+        while nodes and len(nodes) < target:
+            literals, blob = nodes.pop(0)
+            assignment = self.load(solver, literals, blob)
+            var = solver.select_unassigned_variable(assignment)
+            for val in solver.order_domain_values(var, assignment):
+                assignment[var] = val
+                if solver.consistent(assignment):
+                    mark = len(solver.trail)
+                    if solver.assign(var, val):
+                        if solver.assignment_complete(assignment):
+                            return dict(assignment), []
+                        nodes.append(self.snapshot(solver, assignment))
+                    solver.undo(mark)
+                del assignment[var]
+        return None, [(literals, blob, None) for literals, blob in nodes]
+
+    def solve(self, verbose: bool = True) -> Optional[dict]:
+        start = time.perf_counter()
+        solution, tasks = self.frontier()
+        if tasks:
+            solution = self._run(tasks)
+        if verbose:
+            print(f'{self.tasks} subproblems ({self.donations} donations) on {self.workers} workers, '
+                  f'{self.nodes:,} nodes in {(time.perf_counter() - start)*1000:,.1f} ms')
+        return solution
+
+    def _run(self, tasks: List[Task]) -> Optional[dict]:
+        ctx = mp.get_context()
+        queue, results = ctx.Queue(), ctx.Queue()
+        shared = dict(stop=ctx.Event(), outstanding=ctx.Value('i', len(tasks)), queued=ctx.Value('i', len(tasks)),
+                      hungry=ctx.Value('i', 0), tasks=ctx.Value('i', 0), donations=ctx.Value('i', 0),
+                      nodes=ctx.Value('q', 0))
+        for task in tasks:
+            queue.put(task)
+        processes = [ctx.Process(target=_worker, args=(self, queue, results, shared), daemon=True)
+                     for _ in range(self.workers)]
+        for process in processes:
+            process.start()
+        try:
+            message = self._wait(results, processes)
+        finally:
+            shared['stop'].set()
+            for _ in processes:
+                queue.put(None)
+            for process in processes:
+                process.join(timeout=1)
+                if process.is_alive():
+                    process.terminate()
+                    process.join()
+        self.tasks = shared['tasks'].value
+        self.donations = shared['donations'].value
+        self.nodes = shared['nodes'].value
+        if message[0] == 'solved':
+            return {self.cages[i]: self.cages[i].domain.value(row) for i, row in message[1]}
+        return None
+
+    @staticmethod
+    def _wait(results, processes):
+        ''' The first result message. Workers only exit after sending one, so a
+        worker that died, or all workers gone quiet, means no answer is coming. '''
+        while True:
+            try:
+                return results.get(timeout=POLL)
+            except queues.Empty:
+                pass
+            crashed = [process for process in processes if process.exitcode not in (None, 0)]
+            if crashed or not any(process.is_alive() for process in processes):
+                try:
+                    return results.get(timeout=POLL)   # sent just before exiting
+                except queues.Empty:
+                    pass
+                codes = ', '.join(f'{process.pid}: {process.exitcode}' for process in crashed)
+                raise RuntimeError(f'parallel search workers died ({codes or "all exited"}) without a result')
+
+
+def _worker(parallel: ParallelSolver, queue, results, shared):
+    ''' Run subproblems until told to stop. The csp reaches the worker with `parallel`. '''
+    stop, outstanding, queued, hungry = shared['stop'], shared['outstanding'], shared['queued'], shared['hungry']
+    while True:
+        with hungry.get_lock():
+            hungry.value += 1
+        task = queue.get()
+        with hungry.get_lock():
+            hungry.value -= 1
+        if task is None or stop.is_set():
+            return
+        with queued.get_lock():
+            queued.value -= 1
+        solver = parallel.solver()
+        solution = _search(parallel, solver, task, queue, shared)
+        with shared['nodes'].get_lock():
+            shared['nodes'].value += solver.nodes
+        with shared['tasks'].get_lock():
+            shared['tasks'].value += 1
+        if solution is RESTART:
+            return
+        if solution is not None:
+            results.put(('solved', parallel.literals(solution)))
+            return
+        with outstanding.get_lock():
+            outstanding.value -= 1
+            exhausted = outstanding.value == 0
+        if exhausted:
+            results.put(('exhausted',))
+
+def _search(parallel: ParallelSolver, solver: Solver, task: Task, queue, shared):
+    literals, blob, branch = task
+    assignment = parallel.load(solver, literals, blob)
+    if branch is not None:
+        var = parallel.cages[branch[0]]
+        val = var.domain.value(branch[1])
+        assignment[var] = val
+        if not solver.consistent(assignment) or not solver.assign(var, val):
+            return None
+        if solver.order is not None:
+            solver.order.remove(var)
+        if solver.assignment_complete(assignment):
+            return assignment
+    stop, queued, hungry = shared['stop'], shared['queued'], shared['hungry']
+
+    def poll(stack, assignment):
+        if stop.is_set():
+            return True
+        if hungry.value > queued.value:
+            _donate(parallel, solver, stack, assignment, queue, shared)
+        return False
+
+    return solver.backtrack_iterative(assignment, poll=poll)
+
+def _donate(parallel: ParallelSolver, solver: Solver, stack, assignment, queue, shared):
+    ''' Hand the untried values of the shallowest open level to other workers. The
+    level's state is the current one with every removal made below it restored. '''
+    for depth, level in enumerate(stack):
+        rest = list(level[1])
+        if rest:
+            break
+    else:
+        return
+    level[1] = iter(())
+    var, mark = level[0], level[2]
+    alive = {cage: solver.domains[cage].alive.copy() for cage in parallel.cages}
+    for cage, row in solver.trail[mark:]:
+        alive[cage][row] = True
+    below = {open_level[0] for open_level in stack[depth:]}
+    literals = parallel.literals({v: val for v, val in assignment.items() if v not in below})
+    blob = encode_domains([alive[cage] for cage in parallel.cages])
+    i = parallel.index[var]
+    with shared['outstanding'].get_lock():
+        shared['outstanding'].value += len(rest)
+    with shared['queued'].get_lock():
+        shared['queued'].value += len(rest)
+    with shared['donations'].get_lock():
+        shared['donations'].value += 1
+    for val in rest:
+        queue.put((literals, blob, (i, var.domain.row_of(val))))
@@ -0,0 +1,48 @@
+''' One entry point for both KenKen models, and a head-to-head benchmark.
+
+    python generic_solve.py            # every puzzle in assets/kenken_puzzles
+    python generic_solve.py 6 9        # selected puzzles
+'''
+import sys
+import time
+from pathlib import Path
+if __name__ == "__main__":
+    sys.path.append(str(Path(__file__).parent.parent))    # run from generic/: the shared modules are one up
+from generic_kenken import Kenken
+from generic_solver import Solver
+from generic_cell_model import CellModel
+
+PUZZLES_DIR = Path(__file__).parent.parent / 'assets' / 'kenken_puzzles'
+MODELS = ('cage', 'cell')
+
+def solve(kenken: Kenken, model: str = 'cage', **options):
+    ''' Solve `kenken` and return {cage: vector} (or None).
+
+    model='cage' uses the cage-level generic Solver (options are passed to it,
+    e.g. trail=True, ac='bitset', alldiff=True); model='cell' uses CellModel.
+    '''
+    if model == 'cage':
+        return Solver(kenken, **options).solve(verbose=False)
+    if model == 'cell':
+        return CellModel(kenken).solve()
+    raise ValueError(f'unknown model {model!r}, expected one of {MODELS}')
+
+def main():
+    numbers = [int(arg) for arg in sys.argv[1:]] or \
+              sorted(int(path.stem.split('_')[1]) for path in PUZZLES_DIR.glob('puzzle_*.txt'))
+    print(f'{"puzzle":>6} {"size":>5}  ' + '  '.join(f'{model:>10}' for model in MODELS))
+    for number in numbers:
+        kenken = Kenken(str(PUZZLES_DIR / f'puzzle_{number}.txt'))
+        times, solutions = [], []
+        for model in MODELS:
+            options = dict(trail=True, ac='bitset') if model == 'cage' else {}
+            start = time.perf_counter()
+            solutions.append(solve(kenken, model, **options))
+            times.append(time.perf_counter() - start)
+        agree = 'same' if solutions[0] == solutions[1] else 'DIFFERENT'
+        solved = 'solved' if solutions[0] else 'no solution'
+        print(f'{number:>6} {kenken.N:>3}x{kenken.N:<1}  ' +
+              '  '.join(f'{t*1000:>8.1f}ms' for t in times) + f'  {solved}, {agree}')
+
+if __name__ == "__main__":
+    main()
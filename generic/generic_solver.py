@@ -2,55 +2,397 @@ from generic_kenken import Kenken as CSP
 from generic_kenken import Cage as Variable
 from generic_kenken import Domain, Vector, Overlap
 from typing import Dict, List, Set, Tuple
+import bisect
 import copy
+import itertools
+import random
+import numpy as np
+from custom_classes import supported
+from generic_alldiff import alldiff_prune
+from variable_order import VariableOrder
+from budget import Budget, BudgetExceeded, BudgetExhausted
+from solver_stats import SolverStats
+from solver_events import Hooks
 
 Domains_Dict = Dict[Variable, Domain]
+Trail = List[Tuple[Variable, int]]
+SMALL_REVISE = 64   # |D1|*|D2| below which array revises fall back to pairwise checks
+RESTART = object()  # backtrack_iterative ran out of its failure budget
+
+def luby(i: int) -> int:
+    ''' i_th term (from 1) of the Luby sequence 1 1 2 1 1 2 4 1 1 2 1 1 2 4 8 ... '''
+    k = 1
+    while (1 << k) - 1 < i:
+        k += 1
+    if i == (1 << k) - 1:
+        return 1 << (k - 1)
+    return luby(i - (1 << (k - 1)) + 1)
+
 class Solver:
     
-    def __init__(self, csp:CSP):
+    def __init__(self, csp:CSP, trail:bool=False, ac:str='ac3', alldiff:bool=False,
+                 heap:bool=False, lcv:str='scan', iterative:bool=False,
+                 wdeg:bool=False, restarts:int=0, seed=None, cbj:bool=False, hooks:Hooks=None):
+        ''' 
+        trail=True undoes search decisions from a trail of removed (var, row) pairs
+        instead of restoring a deepcopy of every domain at each node.
+        ac selects the arc-consistency engine: 'ac3', 'ac2001' (residual supports),
+        'batch' (whole-domain comparisons, see custom_classes.supported) or
+        'bitset' (compiled compatibility matrices, see Kenken.compile).
+        alldiff=True also runs the row/column all-different propagator after ac3.
+        heap=True picks variables from an incremental MRV/degree heap
+        (variable_order.VariableOrder) instead of sorting them at every node.
+        lcv selects the value ordering: 'scan' counts ruled-out values at every
+        node; 'counts' (needs trail=True) reads support counts that are kept up
+        to date from the compiled matrices as rows are removed and restored.
+        iterative=True (needs trail=True) searches with an explicit stack instead
+        of recursion (backtrack_iterative).
+        wdeg=True chooses variables by domain size / weighted degree, where a pair's
+        weight is bumped each time revising across it wipes out a domain, and
+        breaks ties at random (seed). restarts=k (needs iterative=True) restarts
+        the search after k * luby(run) failed decisions, keeping the weights.
+        cbj=True (needs trail=True) searches with conflict-directed backjumping and
+        records nogoods (backtrack_cbj).
+        hooks receives search events (assignments, backtracks, revisions, wipeouts
+        and ac3 runs, see solver_events); without hooks none are emitted.
+        '''
         assert isinstance(csp, CSP)
         self.csp = csp
 
         # pull node-consistent domains
-        self.domains: Domains_Dict = {var: var.domain
+        self.domains: Domains_Dict = {var: var.domain.copy()
                                         for var in self.csp}
+        self.trail: Trail = [] if trail else None
+        assert ac in ('ac3', 'ac2001', 'batch', 'bitset'), f'unknown ac engine {ac!r}'
+        self.ac = ac
+        if ac == 'bitset':
+            self.csp.compile()
+        self.residues: Dict[Tuple[Variable, Variable], List[int]] = {}
+        self.alldiff = alldiff
+        self.touched: Set[Variable] = set(self.domains) # cages changed since the last all-different pass
+        self.order = None
+        if heap:
+            self.order = VariableOrder({var: len(domain) for var, domain in self.domains.items()},
+                                       self.csp.graph.degree)
+        self.resized: Set[Variable] = set()  # cages whose size the heap has not seen yet
+        assert lcv in ('scan', 'counts'), f'unknown value ordering {lcv!r}'
+        assert lcv == 'scan' or trail, "lcv='counts' follows removals on the trail"
+        self.lcv = lcv
+        assert not iterative or trail, 'the iterative engine undoes from the trail'
+        self.iterative = iterative
+        if lcv == 'counts':
+            self.csp.compile()
+        self.root_rows: Dict[Variable, np.ndarray] = None  # lcv='counts': rows alive when search began
+        self.support: Dict[Variable, np.ndarray] = {}     # per root row: supports summed over neighbours
+        self.pairs: Dict[Tuple[Variable, Variable], np.ndarray] = {}
+        self.pending: List[Tuple[Variable, int, int]] = []  # (var, row, -1 removed / +1 restored) not yet counted
+        assert not (wdeg and heap), 'wdeg replaces the MRV/degree heap'
+        self.wdeg = wdeg
+        self.weights: Dict[Tuple[Variable, Variable], int] = {}  # both orientations; missing = 1
+        self.rng = random.Random(seed)
+        assert not restarts or iterative, 'restarts need the iterative engine'
+        self.restarts = restarts
+        assert not cbj or (trail and not restarts), 'cbj runs its own trail engine'
+        self.cbj = cbj
+        self.cs: Dict[Variable, frozenset] = {var: frozenset() for var in self.domains}  # conflict sets
+        self.explanations: List[Tuple[Variable, frozenset]] = []  # (var, previous conflict set)
+        self.level_of: Dict[Variable, int] = {}     # decision variable -> its depth
+        self.literals: Set[Tuple[Variable, int]] = set()   # current decisions as (var, row)
+        self.nogoods: Dict[Tuple[Variable, int], List[frozenset]] = {}  # literal -> nogoods holding it
+        self.conflict: Set[Variable] = set()        # decisions behind the last wipeout
+        self.backjumps = 0      # levels skipped by backjumping
+        self.nogood_hits = 0    # decisions refused by a recorded nogood
+        self.stats = SolverStats()  # nodes, failures (wiped-out decisions), revisions, checks, ...
+        self.runs = 0       # restarts: runs started
+        self.residue_hits = 0   # ac2001: values whose last support was still alive
+        self.budget: Budget = None  # limits of the running solve(), checked at every node
+        self.hooks = hooks
+
+    def solve(self, verbose:bool=True, budget:Budget=None):
+        ''' Returns the solution, None if there is none, or a (falsy)
+        budget.BudgetExhausted with the counters so far if `budget` runs out first.
+        The budget is checked at every search node and every arc ac3 revises. '''
+        self.budget = budget.start() if budget is not None else None
+        try:
+            with self.stats.phase('node_consistency'):
+                self.enforce_node_consistency()
+            if verbose:
+                print('domain sizes pre ac3:')
+                print([len(self.domains[x]) for x in self.domains])
+            with self.stats.phase('ac3'):
+                self.propagate()
+            if verbose:
+                print('\nDomain sizes after ac3:')
+                print([len(self.domains[x]) for x in self.domains])
+            with self.stats.phase('search'):
+                assignment = self.search()
+        except BudgetExceeded as exceeded:
+            assignment = budget.exhausted(exceeded.reason, self.stats.as_dict())
+        finally:
+            self.budget = None
+        if isinstance(assignment, BudgetExhausted):
+            if verbose:
+                print(f'\nbudget exhausted ({assignment.reason}) after {assignment.nodes:,} nodes')
+            return assignment
+        elapsed = self.stats.phases['search']
+        if verbose:
+            print(f'\n{self.revisions:,} revisions, {self.checks:,} constraint checks ({self.ac})', end='')
+            print(f', {self.residue_hits:,} rescans saved by residues' if self.ac == 'ac2001' else '')
+            if self.restarts:
+                print(f'{self.failures:,} failures over {self.runs} runs (luby x {self.restarts})')
+            if self.cbj:
+                print(f'{self.failures:,} failures, {self.backjumps:,} levels backjumped, '
+                      f'{sum(map(len, self.nogoods.values())):,} nogood entries, {self.nogood_hits:,} hits')
+            print(f'{self.nodes} nodes in {elapsed*1000:,.1f} ms '
+                  f'({self.nodes/max(elapsed, 1e-9):,.0f} nodes/s, {self.engine})')
+        return assignment
+
+    def search(self):
+        ''' The search phase of solve(): backtrack from the current domains with `engine` '''
+        if self.trail is None:
+            return self.backtrack(dict())
+        if self.cbj:
+            return self.backtrack_cbj(dict())
+        if self.restarts:
+            return self.backtrack_restarts()
+        if self.iterative:
+            return self.backtrack_iterative(dict())
+        return self.backtrack_trail(dict())
+
+    def visit(self, depth:int):
+        ''' Count a search node `depth` decisions deep, and charge it to the running budget if any '''
+        if self.budget is not None:
+            self.budget.charge()
+        self.stats.node(depth)
+
+    # counters kept in self.stats, under their old names
+    nodes = property(lambda self: self.stats.nodes)
+    failures = property(lambda self: self.stats.failures)
+    revisions = property(lambda self: self.stats.revisions)
+    checks = property(lambda self: self.stats.checks)
+
+    @property
+    def engine(self) -> str:
+        if self.trail is None:
+            return 'deepcopy'
+        return 'cbj' if self.cbj else 'iterative' if self.iterative else 'trail'
 
-    def solve(self):
-        self.enforce_node_consistency()
-        print('domain sizes pre ac3:')
-        print([len(self.domains[x]) for x in self.domains])
-        self.ac3()
-        print('\nDomain sizes after ac3:')
-        print([len(self.domains[x]) for x in self.domains])
-        return self.backtrack(dict())
     def enforce_node_consistency(self):
         pass
 
     def ac3(self, arcs=None):
-        ''' generic ac3 algorithm '''
-
-        def revise(var1, var2):
-            revised = False
-            for vector1 in list(self.domains[var1]):
-                if not any(self.csp.is_consistent(var1, var2, vector1, vector2) for vector2 in self.domains[var2]):
-                    self.domains[var1].remove(vector1)
-                    revised = True
-            return revised
+        ''' generic ac3 algorithm; `self.ac` picks the revise step '''
+        revise = {'ac3': self.revise, 'ac2001': self.revise_ac2001,
+                  'batch': self.revise_batch, 'bitset': self.revise_bitset}[self.ac]
 
         if arcs is None:
             arcs = [(var1, var2) 
                     for var1 in self.domains 
                     for var2 in self.domains 
                     if var1 is not var2]
+        hooks = self.hooks
+        if hooks is not None:
+            hooks.emit('ac3_start', len(arcs))
         while arcs:
             (var1, var2) = arcs.pop(0)
-            if revise(var1, var2):
+            self.stats.revisions += 1
+            if self.budget is not None:
+                self.budget.check()
+            revised = revise(var1, var2)
+            if hooks is not None:
+                hooks.emit('on_revise', var1, var2, revised)
+            if revised:
+                if self.cbj:
+                    self.explain(var1, self.reason(var2))
                 if len(self.domains[var1]) == 0:
+                    if self.wdeg:
+                        self.bump(var1, var2)
+                    if self.cbj:
+                        self.conflict = set(self.reason(var1))
+                    if hooks is not None:
+                        hooks.emit('on_domain_wipeout', var1, var2)
+                        hooks.emit('ac3_end', False)
                     return False
                 for var_n in self.csp.neighbors(var1).difference({var2}):
                     arcs.append((var_n, var1))
+        if hooks is not None:
+            hooks.emit('ac3_end', True)
         return True
+
+    def propagate(self, arcs=None):
+        ''' ac3, alternated with the all-different propagator when enabled, to a fixpoint.
+        Returns False if a domain was wiped out. '''
+        while True:
+            if not self.ac3(arcs):
+                return False
+            if not self.alldiff:
+                return True
+            changed = self.enforce_alldiff()
+            if changed is None:
+                return False
+            if not changed:
+                return True
+            arcs = [(other_var, var) for var in changed for other_var in self.csp.neighbors(var)]
+
+    def enforce_alldiff(self):
+        ''' Régin filtering of the rows and columns of every cage changed since the last
+        pass, projected onto the cage domains.
+        Returns the set of cages that lost values, or None on a wipeout. '''
+        changed = set()
+        units = sorted({u for cage in self.touched for u in self.csp.units_of[cage]})
+        self.touched = set()
+        for unit in (self.csp.units[u] for u in units):
+            cell_domains = []
+            for cage, position in unit:
+                domain = self.domains[cage]
+                cell_domains.append(set(np.unique(domain.matrix[domain.alive, position]).tolist()))
+            removals = alldiff_prune(cell_domains)
+            if self.cbj:
+                reason = frozenset().union(*(self.reason(cage) for cage, _ in unit))
+            if removals is None:
+                if self.cbj:
+                    self.conflict = set(reason)
+                return None
+            for i, digit in removals:
+                cage, position = unit[i]
+                domain = self.domains[cage]
+                rows = domain.rows()
+                for row in rows[domain.matrix[rows, position] == digit].tolist():
+                    self.remove_row(cage, row)
+                changed.add(cage)
+                if self.cbj:
+                    self.explain(cage, reason)
+                if not domain:
+                    if self.cbj:
+                        self.conflict = set(self.reason(cage))
+                    return None
+        return changed
+
+    def revise(self, var1, var2):
+        revised = False
+        for vector1 in list(self.domains[var1]):
+            for vector2 in self.domains[var2]:
+                self.stats.checks += 1
+                if self.csp.is_consistent(var1, var2, vector1, vector2):
+                    break
+            else:
+                self.remove(var1, vector1)
+                revised = True
+        return revised
+
+    def revise_ac2001(self, var1, var2):
+        ''' AC-2001/AC-3.1 revise: remember the last support of each (var1, row, var2)
+        and resume the scan of var2's domain from it.
+
+        The scan wraps around to the start of the domain, so a stale residue (say,
+        after backtracking restored earlier rows) can cost checks but never a support.
+        '''
+        domain1, domain2 = self.domains[var1], self.domains[var2]
+        last = self.residues.get((var1, var2))
+        if last is None:
+            last = self.residues[var1, var2] = [-1] * len(domain1.table)
+        alive2 = domain2.alive
+        rows2 = domain2.rows().tolist()
+        is_consistent, value1, value2 = self.csp.is_consistent, domain1.value, domain2.value
+        revised = False
+        for row1 in domain1.rows().tolist():
+            residue = last[row1]
+            if residue >= 0 and alive2[residue]:
+                self.residue_hits += 1
+                continue
+            vector1 = value1(row1)
+            start = bisect.bisect_right(rows2, residue)
+            for row2 in itertools.chain(rows2[start:], rows2[:start]):
+                self.stats.checks += 1
+                if is_consistent(var1, var2, vector1, value2(row2)):
+                    last[row1] = row2
+                    break
+            else:
+                self.remove_row(var1, row1)
+                revised = True
+        return revised
     
+    def revise_bitset(self, var1, var2):
+        ''' revise against the compiled compatibility bit-matrices: one row-wise
+        AND with var2's alive mask per value of var1. Tiny domains (the common
+        case deep in the search) are cheaper to revise pair by pair. '''
+        if (var1, var2) not in self.csp.compat:
+            return False
+        domain1, domain2 = self.domains[var1], self.domains[var2]
+        if len(domain1) * len(domain2) <= SMALL_REVISE:
+            return self.revise(var1, var2)
+        rows1 = domain1.rows()
+        self.stats.checks += len(rows1)
+        supported = self.csp.supported(var1, var2, rows1, domain2.alive)
+        dead = rows1[~supported].tolist()
+        for row in dead:
+            self.remove_row(var1, row)
+        return bool(dead)
+
+    def revise_batch(self, var1, var2):
+        ''' revise with one batched comparison of var1's domain matrix against var2's
+        (custom_classes.supported) instead of one check per pair of values '''
+        overlap = self.csp.overlaps.get((var1, var2))
+        if overlap is None:
+            return False
+        domain1, domain2 = self.domains[var1], self.domains[var2]
+        if len(domain1) * len(domain2) <= SMALL_REVISE:
+            return self.revise(var1, var2)
+        rows1 = domain1.rows()
+        self.stats.checks += len(rows1)
+        keep = supported(domain1.matrix[rows1], domain2.matrix[domain2.alive], overlap)
+        dead = rows1[~keep].tolist()
+        for row in dead:
+            self.remove_row(var1, row)
+        return bool(dead)
+
+    def remove(self, var, value):
+        ''' Remove `value` from the domain of `var`, recording it on the trail if there is one '''
+        self.remove_row(var, self.domains[var].row_of(value))
+
+    def remove_row(self, var, row:int):
+        if self.domains[var].discard_row(row):
+            self.stats.pruned += 1
+            if self.trail is not None:
+                self.trail.append((var, row))
+            if self.alldiff:
+                self.touched.add(var)
+            if self.order is not None:
+                self.resized.add(var)
+            if self.root_rows is not None:
+                self.pending.append((var, row, -1))
+
+    def undo(self, mark:int):
+        ''' Restore every removal recorded on the trail since `mark` '''
+        trail = self.trail
+        while len(trail) > mark:
+            var, row = trail.pop()
+            self.domains[var].restore_row(row)
+            if self.order is not None:
+                self.resized.add(var)
+            if self.root_rows is not None:
+                self.pending.append((var, row, 1))
+
+    def reason(self, var) -> frozenset:
+        ''' The decisions that explain var's current domain: its conflict set, plus
+        var itself if it is assigned '''
+        if var in self.level_of:
+            return self.cs[var] | {var}
+        return self.cs[var]
+
+    def explain(self, var, reason:frozenset):
+        ''' var lost rows because of `reason`: grow its conflict set (undoably) '''
+        old = self.cs[var]
+        if not reason <= old:
+            self.explanations.append((var, old))
+            self.cs[var] = old | reason
+
+    def undo_explanations(self, mark:int):
+        explanations = self.explanations
+        while len(explanations) > mark:
+            var, old = explanations.pop()
+            self.cs[var] = old
+
     def assignment_complete(self, assignment):
         """
         Return True if `assignment` is complete (i.e., assigns a value to each
@@ -66,6 +408,8 @@ class Solver:
         Return True if `assignment` is consistent (i.e., words fit in crossword
         puzzle without conflicting characters); return False otherwise.
         """
+        if self.csp.compat is not None:
+            return self._consistent_compiled(assignment)
         for var1 in assignment:
             vector_1 = assignment[var1]
 
@@ -89,6 +433,11 @@ class Solver:
         that rules out the fewest values among the neighbors of `var`.
         """
 
+        if self.lcv == 'counts':
+            return self._order_domain_values_counted(var)
+        if self.csp.compat is not None:
+            return self._order_domain_values_compiled(var)
+
         ruleouts = {val: 0 for val in self.domains[var]}
 
         # Iterate through all possible values of var:
@@ -110,6 +459,87 @@ class Solver:
         # SIMPLE, INEFFICIENT - RETURN IN ANY ORDER:
         #return [x for x in self.domains[var]]
 
+    def _consistent_compiled(self, assignment):
+        ''' consistent() with bit lookups on domain rows instead of value comparisons '''
+        rows = {var: self.domains[var].row_of(value) for var, value in assignment.items()}
+        for var1, row1 in rows.items():
+            for var2 in self.csp.neighbors(var1):
+                row2 = rows.get(var2)
+                if row2 is not None and not self.csp.compatible(var1, var2, row1, row2):
+                    return False
+        return True
+
+    def _order_domain_values_compiled(self, var):
+        ''' order_domain_values from support counts in the compiled bit-matrices '''
+        domain = self.domains[var]
+        rows = domain.rows()
+        ruleouts = np.zeros(len(rows), dtype=np.int64)
+        for other_var in self.csp.neighbors(var):
+            other = self.domains[other_var]
+            ruleouts += len(other) - self.csp.support_counts(var, other_var, rows, other.alive)
+        return [domain.value(row) for row in rows[np.argsort(ruleouts, kind='stable')].tolist()]
+
+    def _order_domain_values_counted(self, var):
+        ''' order_domain_values from the maintained support counts.
+
+        The values var rules out among its neighbours are sum(|D_n|) minus the
+        supports it keeps, and the first term is the same for every value, so
+        sorting by support count (descending) is the LCV order: O(d log d).
+        '''
+        if self.root_rows is None:
+            self._mark_root()
+        elif self.pending:
+            self._flush_supports()
+        if var not in self.support:
+            self._count_supports(var)
+        domain = self.domains[var]
+        rows = domain.rows()
+        counts = self.support[var][self.local_index[var][rows]]
+        return [domain.value(row) for row in rows[np.argsort(-counts, kind='stable')].tolist()]
+
+    def _mark_root(self):
+        ''' Search only ever restores rows it removed itself, so the rows alive at the
+        first ordering are all that can be alive later; counts are kept over those. '''
+        self.root_rows = {var: domain.rows() for var, domain in self.domains.items()}
+        self.local_index = {}
+        for var, rows in self.root_rows.items():
+            index = np.full(len(self.domains[var].table), -1, dtype=np.int64)
+            index[rows] = np.arange(len(rows))
+            self.local_index[var] = index
+        self.pending = []
+
+    def _count_supports(self, var1):
+        ''' support[var1], from the compiled bit-matrices cut down to the root rows
+        (pairs[var1, var2], dense 0/1) and the neighbours' current domains.
+        Built the first time var1 is ordered, then kept up to date. '''
+        rows1 = self.root_rows[var1]
+        total = np.zeros(len(rows1), dtype=np.int64)
+        for var2 in self.csp.neighbors(var1):
+            rows2 = self.root_rows[var2]
+            bits = self.csp.compat[var1, var2][rows1]
+            dense = np.unpackbits(bits, axis=1, count=len(self.domains[var2].table))
+            pair = self.pairs[var1, var2] = dense[:, rows2].astype(np.int64)
+            total += pair @ self.domains[var2].alive[rows2]
+        self.support[var1] = total
+
+    def _flush_supports(self):
+        ''' Apply the removals and restores recorded since the last ordering; a row
+        removed and restored in between cancels out and costs nothing. '''
+        net: Dict[Variable, Dict[int, int]] = {}
+        for var, row, sign in self.pending:
+            rows = net.setdefault(var, {})
+            rows[row] = rows.get(row, 0) + sign
+        self.pending = []
+        for var2, rows in net.items():
+            rows = {row: sign for row, sign in rows.items() if sign}
+            if not rows:
+                continue
+            local2 = self.local_index[var2][np.fromiter(rows.keys(), dtype=np.int64, count=len(rows))]
+            signs = np.fromiter(rows.values(), dtype=np.int64, count=len(rows))
+            for var1 in self.csp.neighbors(var2):
+                if var1 in self.support:
+                    self.support[var1] += self.pairs[var1, var2][:, local2] @ signs
+
     def select_unassigned_variable(self, assignment):
         """
         Return an unassigned variable not already part of `assignment`.
@@ -119,6 +549,15 @@ class Solver:
         return values.
         """
 
+        if self.wdeg:
+            return self._select_wdeg(assignment)
+        if self.order is not None:
+            domains, order = self.domains, self.order
+            for var in self.resized:
+                order.update(var, len(domains[var]))
+            self.resized.clear()
+            return order.peek()
+
         # Get set of unassigned variables
         unassigned = set(self.domains.keys()) - set(assignment.keys())
 
@@ -129,25 +568,370 @@ class Solver:
         return result[0]
 
 
+    def bump(self, var1, var2):
+        ''' Revising var1 against var2 wiped out var1: weigh their constraint more '''
+        weight = self.weights.get((var1, var2), 1) + 1
+        self.weights[var1, var2] = self.weights[var2, var1] = weight
+
+    def _select_wdeg(self, assignment):
+        ''' dom/wdeg: smallest domain size over the summed weights of the constraints
+        to unassigned neighbours; ties are broken at random '''
+        best, ties = None, []
+        for var in self.domains:
+            if var in assignment:
+                continue
+            wdeg = sum(self.weights.get((var, other), 1)
+                       for other in self.csp.neighbors(var) if other not in assignment)
+            score = len(self.domains[var]) / wdeg if wdeg else float('inf')
+            if best is None or score < best:
+                best, ties = score, [var]
+            elif score == best:
+                ties.append(var)
+        return ties[0] if len(ties) == 1 else self.rng.choice(ties)
+
     def backtrack(self, assignment):
+        self.visit(len(assignment))
         # If all variables are assigned, return assignment:
         if self.assignment_complete(assignment):
             return assignment
 
         # Otherwise select an unassigned variable:
         var = self.select_unassigned_variable(assignment)
+        if self.order is not None:
+            self.order.remove(var)
         pre_assignment_domains = copy.deepcopy(self.domains)
         for val in self.order_domain_values(var, assignment):
             assignment[var] = val
+            self.stats.assignments += 1
+            if self.hooks is not None:
+                self.hooks.emit('on_assign', var, val, len(assignment))
             if self.consistent(assignment):
                 # Update variable domain to be assigned value
-                self.domains[var] = {val}
+                self.domains[var] = self.domains[var] & {val}
                 # Use ac3 to remove inconcistent values from neighbouring variables
-                self.ac3([(other_var, var) for other_var in self.csp.neighbors(var)])
-                result = self.backtrack(assignment)
-                if result:
-                    return result
+                if self.propagate([(other_var, var) for other_var in self.csp.neighbors(var)]):
+                    result = self.backtrack(assignment)
+                    if result:
+                        return result
             # If assignment does not produce solution, remove assignment and reset domains
             del assignment[var]
-            self.domains = pre_assignment_domains
+            if self.hooks is not None:
+                self.hooks.emit('on_backtrack', var, len(assignment))
+            self.domains = copy.deepcopy(pre_assignment_domains)
+            if self.order is not None:
+                self.resized.update(self.domains)
+        if self.order is not None:
+            self.order.push(var)
+        return None
+
+    def backtrack_trail(self, assignment):
+        ''' backtrack() with trail-based undo: each decision level remembers the trail
+        length before it, and failure pops the trail back to that marker. '''
+        self.visit(len(assignment))
+        if self.assignment_complete(assignment):
+            return assignment
+
+        var = self.select_unassigned_variable(assignment)
+        if self.order is not None:
+            self.order.remove(var)
+        for val in self.order_domain_values(var, assignment):
+            assignment[var] = val
+            self.stats.assignments += 1
+            if self.hooks is not None:
+                self.hooks.emit('on_assign', var, val, len(assignment))
+            if self.consistent(assignment):
+                mark = len(self.trail)
+                if self.assign(var, val):
+                    result = self.backtrack_trail(assignment)
+                    if result:
+                        return result
+                else:
+                    self.stats.failures += 1
+                self.undo(mark)
+            del assignment[var]
+            if self.hooks is not None:
+                self.hooks.emit('on_backtrack', var, len(assignment))
+        if self.order is not None:
+            self.order.push(var)
+        return None
+
+    def backtrack_iterative(self, assignment, limit=float('inf'), poll=None):
+        ''' backtrack_trail() without recursion, so depth is not bounded by Python's
+        recursion limit. Each level of the explicit stack is [var, iterator over its
+        ordered values, trail mark of the value being tried below]. Visits the same
+        nodes in the same order, so solutions and statistics match backtrack_trail.
+        Returns RESTART, with the assignment and trail left mid-search, once
+        self.failures reaches `limit`, or once poll(stack, assignment), called at
+        every node, returns True. poll may also empty the value iterators of
+        levels it hands to someone else (see generic_parallel). '''
+        stack = []
+        descend = True
+        while True:
+            if descend:
+                self.visit(len(assignment))
+                if self.assignment_complete(assignment):
+                    return assignment
+                if poll is not None and poll(stack, assignment):
+                    return RESTART
+                var = self.select_unassigned_variable(assignment)
+                if self.order is not None:
+                    self.order.remove(var)
+                stack.append([var, iter(self.order_domain_values(var, assignment)), None])
+            level = stack[-1]
+            var, values, mark = level
+            if mark is not None:
+                # the subtree below the current value failed
+                self.undo(mark)
+                del assignment[var]
+                if self.hooks is not None:
+                    self.hooks.emit('on_backtrack', var, len(assignment))
+                level[2] = None
+            descend = False
+            for val in values:
+                assignment[var] = val
+                self.stats.assignments += 1
+                if self.hooks is not None:
+                    self.hooks.emit('on_assign', var, val, len(assignment))
+                if self.consistent(assignment):
+                    mark = len(self.trail)
+                    if self.assign(var, val):
+                        level[2] = mark
+                        descend = True
+                        break
+                    self.undo(mark)
+                    self.stats.failures += 1
+                    if self.failures >= limit:
+                        del assignment[var]
+                        if self.hooks is not None:
+                            self.hooks.emit('on_backtrack', var, len(assignment))
+                        return RESTART
+                del assignment[var]
+                if self.hooks is not None:
+                    self.hooks.emit('on_backtrack', var, len(assignment))
+            if not descend:
+                stack.pop()
+                if self.order is not None:
+                    self.order.push(var)
+                if not stack:
+                    return None
+
+    def backtrack_restarts(self):
+        ''' backtrack_iterative in runs of luby(run) * self.restarts failures. Each run
+        starts over from the root domains, but with the weights learned so far. '''
+        root = len(self.trail)
+        for run in itertools.count(1):
+            self.runs = run
+            assignment = dict()
+            result = self.backtrack_iterative(assignment, self.failures + luby(run) * self.restarts)
+            if result is not RESTART:
+                return result
+            if self.hooks is not None:
+                for var in reversed(list(assignment)):
+                    del assignment[var]
+                    self.hooks.emit('on_backtrack', var, len(assignment))
+            self.undo(root)
+            if self.order is not None:
+                for var in self.domains:
+                    self.order.push(var)
+
+    def count_solutions(self, limit=None) -> int:
+        ''' Number of solutions, or `limit` if there are at least that many.
+
+        Needs trail=True. Propagates at the root, then counts every connected
+        component of the constraint graph on its own and multiplies: cages in
+        different components never constrain each other, so their solutions
+        combine freely. Each component's search keeps going after a solution,
+        undoing from the trail, and stops once the product cannot stay below
+        `limit`. Domains are back at the root fixpoint afterwards.
+        '''
+        assert self.trail is not None, 'counting undoes from the trail'
+        self.enforce_node_consistency()
+        if not self.propagate():
+            return 0
+        total = 1
+        for component in self.csp.graph.components():
+            count = self._count_component(component, None if limit is None else -(-limit // total))
+            if count == 0:
+                return 0
+            total *= count
+        return total if limit is None else min(total, limit)
+
+    def is_unique(self) -> bool:
+        ''' True iff the puzzle has exactly one solution '''
+        return self.count_solutions(limit=2) == 1
+
+    def _count_component(self, variables, limit) -> int:
+        ''' backtrack_iterative over `variables` only, counting complete
+        assignments instead of returning the first one '''
+        degree = self.csp.graph.degree
+        root = len(self.trail)
+        assignment = {}
+        stack = []
+        count = 0
+        descend = True
+        while True:
+            if descend:
+                self.visit(len(assignment))
+                unassigned = [var for var in variables if var not in assignment]
+                if unassigned:
+                    var = min(unassigned, key=lambda x: (len(self.domains[x]), -degree(x)))
+                    stack.append([var, iter(self.order_domain_values(var, assignment)), None])
+                else:
+                    count += 1
+                    if limit is not None and count >= limit:
+                        break
+            if not stack:
+                break
+            level = stack[-1]
+            var, values, mark = level
+            if mark is not None:
+                self.undo(mark)
+                del assignment[var]
+                if self.hooks is not None:
+                    self.hooks.emit('on_backtrack', var, len(assignment))
+                level[2] = None
+            descend = False
+            for val in values:
+                assignment[var] = val
+                self.stats.assignments += 1
+                if self.hooks is not None:
+                    self.hooks.emit('on_assign', var, val, len(assignment))
+                if self.consistent(assignment):
+                    mark = len(self.trail)
+                    if self.assign(var, val):
+                        level[2] = mark
+                        descend = True
+                        break
+                    self.undo(mark)
+                    self.stats.failures += 1
+                del assignment[var]
+                if self.hooks is not None:
+                    self.hooks.emit('on_backtrack', var, len(assignment))
+            if not descend:
+                stack.pop()
+                if not stack:
+                    break
+        self.undo(root)
+        return count
+
+    def backtrack_cbj(self, assignment):
+        ''' Conflict-directed backjumping (Prosser, 1993) on top of full propagation.
+
+        Every cage carries a conflict set: the decisions that explain the rows it
+        has lost (a revise adds var2's set, and var2 itself if assigned; the
+        all-different filter adds those of the whole unit). A failed value adds the
+        decisions behind its wipeout to its level's conflicts. When a level runs out
+        of values, its conflicts are recorded as a nogood and the search jumps
+        straight back to the deepest decision among them, skipping the levels in
+        between, which could not have repaired the failure.
+        Nogoods are indexed by each of their (var, row) literals, so a decision only
+        checks the nogoods that mention it.
+        '''
+        stack = []    # [var, values, trail mark, explanation mark, conflicts] per level
+        descend = True
+        while True:
+            if descend:
+                self.visit(len(assignment))
+                if self.assignment_complete(assignment):
+                    return assignment
+                var = self.select_unassigned_variable(assignment)
+                if self.order is not None:
+                    self.order.remove(var)
+                stack.append([var, iter(self.order_domain_values(var, assignment)), None, None, set()])
+            level = stack[-1]
+            var, values, conflicts = level[0], level[1], level[4]
+            descend = False
+            for val in values:
+                assignment[var] = val
+                self.stats.assignments += 1
+                if self.hooks is not None:
+                    self.hooks.emit('on_assign', var, val, len(assignment))
+                literal = (var, self.domains[var].row_of(val))
+                nogood = self.violated_nogood(literal)
+                if nogood is not None:
+                    self.nogood_hits += 1
+                    conflicts.update(v for v, _ in nogood)
+                elif not self.consistent(assignment):
+                    conflicts.update(v for v in self.csp.neighbors(var) if v in assignment)
+                else:
+                    level[2], level[3] = len(self.trail), len(self.explanations)
+                    self.level_of[var] = len(stack) - 1
+                    self.literals.add(literal)
+                    if self.assign(var, val):
+                        descend = True
+                        break
+                    self.stats.failures += 1
+                    conflicts |= self.conflict
+                    self._retract(level, assignment)
+                conflicts.discard(var)
+                del assignment[var]
+                if self.hooks is not None:
+                    self.hooks.emit('on_backtrack', var, len(assignment))
+            if descend:
+                continue
+
+            # no value of var is left
+            conflicts |= self.cs[var]   # the rows var had lost before it was chosen
+            conflicts.discard(var)
+            stack.pop()
+            if self.order is not None:
+                self.order.push(var)
+            if not conflicts:
+                # no decision is to blame: the puzzle has no solution
+                while stack:
+                    level = stack.pop()
+                    self._retract(level, assignment)
+                    del assignment[level[0]]
+                    if self.hooks is not None:
+                        self.hooks.emit('on_backtrack', level[0], len(assignment))
+                    if self.order is not None:
+                        self.order.push(level[0])
+                return None
+            self.record_nogood(conflicts, assignment)
+            while stack[-1][0] not in conflicts:
+                skipped = stack.pop()
+                self._retract(skipped, assignment)
+                del assignment[skipped[0]]
+                if self.hooks is not None:
+                    self.hooks.emit('on_backtrack', skipped[0], len(assignment))
+                if self.order is not None:
+                    self.order.push(skipped[0])
+                self.backjumps += 1
+            target = stack[-1]
+            self._retract(target, assignment)
+            del assignment[target[0]]
+            if self.hooks is not None:
+                self.hooks.emit('on_backtrack', target[0], len(assignment))
+            target[4] |= conflicts - {target[0]}
+
+    def _retract(self, level, assignment):
+        ''' Undo the decision active at `level` (the caller drops it from `assignment`) '''
+        var = level[0]
+        self.undo(level[2])
+        self.undo_explanations(level[3])
+        self.literals.discard((var, self.domains[var].row_of(assignment[var])))
+        del self.level_of[var]
+        level[2] = level[3] = None
+
+    def violated_nogood(self, literal):
+        ''' A recorded nogood that `literal` would complete, or None '''
+        for nogood in self.nogoods.get(literal, ()):
+            if all(other == literal or other in self.literals for other in nogood):
+                return nogood
         return None
+
+    def record_nogood(self, decisions, assignment):
+        ''' The current values of `decisions` cannot all hold in any solution '''
+        nogood = frozenset((var, self.domains[var].row_of(assignment[var])) for var in decisions)
+        for literal in nogood:
+            self.nogoods.setdefault(literal, []).append(nogood)
+
+    def assign(self, var, val) -> bool:
+        ''' Reduce the domain of var to val on the trail and propagate.
+        False on a wipeout; the caller undoes to its mark either way. '''
+        domain = self.domains[var]
+        keep = domain.row_of(val)
+        for row in domain.rows().tolist():
+            if row != keep:
+                self.remove_row(var, row)
+        return self.propagate([(other_var, var) for other_var in self.csp.neighbors(var)])
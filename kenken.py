@@ -2,12 +2,12 @@ import itertools
 import math
 
 from collections import defaultdict
-from functools import cache
 import ast
 import numpy as np
-from typing import List, Tuple
+from typing import Dict, List, Tuple
 
-from custom_classes import Overlap, Vector
+from custom_classes import Overlap, Vector, DomainStore, DomainTable, SparseOverlaps, ConstraintGraph
+from domain_cache import default_cache
 
 
 EQUAL, ADD, SUB, MULT, DIV = '=+-x÷'
@@ -15,23 +15,76 @@ OP_FUNC = { ADD:   sum,
             SUB:   lambda x,y: max(x,y)-min(x,y),
             MULT:  math.prod,
             DIV:   lambda x,y: max(x,y)/min(x,y) }
+
+def candidate_vectors(op: str, target: int, cells: List[Tuple[int, int]], N: int):
+    '''Yield every ADD/MULT vector for a cage, one cell at a time.
+
+    Equivalent to filtering all permutations of the digit pool, but partial
+    vectors are dropped as soon as they break the running sum/product bounds
+    or repeat a digit in a row or column, so the cost grows with the number
+    of valid vectors rather than with the permutation space.
+    '''
+    k = len(cells)
+    rows_used, cols_used = defaultdict(set), defaultdict(set)
+    vector = []
+
+    def extend(position, remainder):
+        # remainder: what is left of the target (difference for ADD, quotient for MULT)
+        left = k - position - 1   # cells still unfilled after this one
+        r, c = cells[position]
+        for digit in range(1, N+1):
+            if digit in rows_used[r] or digit in cols_used[c]:
+                continue
+            if op == ADD:
+                rest = remainder - digit
+                if rest < left:        # remaining cells need at least 1 each
+                    break
+                if rest > left * N:    # remaining cells can add at most N each
+                    continue
+            else:  # MULT
+                if remainder % digit:
+                    continue
+                rest = remainder // digit
+                if rest > N ** left:
+                    continue
+            if left == 0:
+                if rest == (0 if op == ADD else 1):
+                    yield tuple(vector + [digit])
+                continue
+            vector.append(digit); rows_used[r].add(digit); cols_used[c].add(digit)
+            yield from extend(position + 1, rest)
+            vector.pop(); rows_used[r].discard(digit); cols_used[c].discard(digit)
+
+    yield from extend(0, target)
+
 class Cage:
     ''' This class replaces Crossword's Variable class '''
     id_generator = itertools.count(0)
-    def __init__(self, op, target, cells, N):
+    def __init__(self, op, target, cells, N, cache=None):
         self.id = next(Cage.id_generator)
         self.target = target
         self.cells = cells
         self.N = N
         self.op = op
-        self.set_initial_domain_()
+        self.set_initial_domain_(cache)
 
-    def set_initial_domain_(self):
+    def set_initial_domain_(self, cache=None):
         '''In-place operation 
 
         In Crossword's Variable class, we explore all possible words that might
         fit.  Here, we explore all possible integer tuples (vectors).
+        With a DomainCache, the vectors are looked up by (op, target, N, shape)
+        and only computed on a miss.
         '''
+        if cache is None:
+            rows = self._domain_matrix()
+        else:
+            key = cache.key(self.op, self.target, self.cells, self.N)
+            rows = cache.get_or_compute(key, self._domain_matrix)
+        self.domain = DomainStore(DomainTable(rows, Vector))
+
+    def _domain_matrix(self):
+        ''' All candidate vectors as an int8 matrix, one row per vector '''
         op = self.op; 
         N = self.N
         target = self.target
@@ -44,15 +97,8 @@ class Cage:
                         for n2 in range(1, N+1)
                         if OP_FUNC[op](n1,n2) == target and n1 != n2}
         else: # op in (ADD, MULT)
-            rows_occupied, cols_occupied = zip(*self.cells)
-            max_duplicates = min(len(set(rows_occupied)), len(set(cols_occupied)))
-            digit_pool = list(range(1, N+1)) * max_duplicates
-            domain = {
-                  permutation
-                  for permutation in itertools.permutations(digit_pool, len(self.cells))
-                  if self._row_column_constraint_satisfied(permutation)
-                     and OP_FUNC[op](permutation) == self.target}
-        self.domain = {Vector(list(v)) for v in domain}
+            domain = set(candidate_vectors(op, target, self.cells, N))
+        return np.array(sorted(domain), dtype=np.int8).reshape(-1, len(self.cells))
     
     def _row_column_constraint_satisfied(self, perm):
         rows, cols = defaultdict(set), defaultdict(set)
@@ -71,24 +117,71 @@ class Cage:
     def length(self): # Required: used by crossword solver
         return self.__len__()  
     def __hash__(self):         return hash(self.id)
-    def __eq__(self, other):    return self.id == other.id
+    def __eq__(self, other):    return isinstance(other, Cage) and self.id == other.id   # never a Vector with the same id
     def __len__(self):          return len(self.cells)
     def __repr__(self):         return f"{self.id}:{self.op}, {self.target}, {self.cells})" 
     def __str__(self):          return self.__repr__()
     def __copy__(self):         return self
+    def __deepcopy__(self, memo): return self
+
 
+def overlap_points(cages) -> Dict[Tuple[Cage, Cage], List[Tuple[int, int]]]:
+    ''' (i, j) positions where cage1's i_th cell shares a row or column with cage2's j_th.
+
+    Cells are indexed by row and by column first, so only cells that really
+    share a line are compared: the work grows with N^3, not with (cages x cells)^2.
+    '''
+    lines = defaultdict(list)   # ('row', r) / ('col', c) -> [(cage, position)]
+    for cage in cages:
+        for position, (r, c) in enumerate(cage.cells):
+            lines['row', r].append((cage, position))
+            lines['col', c].append((cage, position))
+    points = defaultdict(list)
+    for members in lines.values():
+        for cage1, position1 in members:
+            for cage2, position2 in members:
+                if cage1 != cage2:
+                    points[cage1, cage2].append((position1, position2))
+    return {key: sorted(pts) for key, pts in points.items()}
+
+def read_structure(structure_file) -> List[Tuple[str, int, List[Tuple[int, int]]]]:
+    ''' (op, target, cells) per line of a puzzle file, with the operators normalised '''
+    structure = []
+    with open(structure_file,'r') as f:
+        for line in f:
+            op, target, cells = ast.literal_eval(line)
+            op = {'/':'÷','*':'x',' ':'='}.get(op, op)
+            structure.append((op, target, cells))
+    return structure
+
+def is_solution(structure, grid: Dict[Tuple[int, int], int]) -> bool:
+    ''' Whether `grid` ({(row, col): digit}) solves the puzzle described by `structure` '''
+    N = 1 + max(row for (_, _, cells) in structure for (row, _) in cells)
+    digits = set(range(1, N + 1))
+    if set(grid) != {(r, c) for r in range(N) for c in range(N)}:
+        return False
+    if any({grid[r, c] for c in range(N)} != digits or {grid[c, r] for c in range(N)} != digits
+           for r in range(N)):
+        return False
+    for op, target, cells in structure:
+        values = [grid[cell] for cell in cells]
+        if op == EQUAL:
+            value = values[0]
+        elif op in (ADD, MULT):
+            value = OP_FUNC[op](values)
+        else:
+            value = OP_FUNC[op](*values)
+        if value != target:
+            return False
+    return True
 
 class Kenken:
     """ A class to represent a Kenken puzzle as a list of cages """
     
-    def __init__(self, structure_file, word_file=None):
+    def __init__(self, structure_file, word_file=None, cache=None):
+        ''' `cache` is a DomainCache for cage domains; defaults to domain_cache.default_cache() '''
         self.words = set()  # required during CrosswordCreator initialization
-        self.structure = []
-        with open(structure_file,'r') as f:
-            for line in f:
-                op, target, cells = ast.literal_eval(line)
-                op = {'/':'÷','*':'x',' ':'='}.get(op, op)
-                self.structure.append((op, target, cells))
+        self.structure = read_structure(structure_file)
     
         # get the dimension of the puzzle -- 
         self.N = 1 + max(row 
@@ -97,7 +190,8 @@ class Kenken:
 
         # Build cages
         Cage.id_generator = itertools.count(0)
-        self.cages = [Cage(op=op, target=target, cells=cells, N=self.N)
+        cache = default_cache() if cache is None else cache
+        self.cages = [Cage(op=op, target=target, cells=cells, N=self.N, cache=cache)
                       for (op, target, cells) in self.structure]
         
         
@@ -116,29 +210,20 @@ class Kenken:
 
         Here, we wrap the output in a custom class, Overlap. See write-up for details
         '''
-        from collections import defaultdict
-        self.overlaps = defaultdict(lambda: None)
-        self._overlaps = defaultdict(lambda: None)
-        for cage1 in self.cages:
-            for cage2 in self.cages:
-                if cage1 != cage2:  # Don't compute overlaps with self
-                    overlap_pts = []
-                    for position1, cell1 in enumerate(cage1.cells):
-                        for position2, cell2 in enumerate(cage2.cells):
-                            if cell1[0] == cell2[0] or cell1[1] == cell2[1]:
-                                overlap_pts.append((position1, position2))
-                    if overlap_pts != []:
-                        self.overlaps[(cage1, cage2)] = Overlap(overlap_pts)
-                        self._overlaps[(cage1, cage2)] = overlap_pts
-
-    @cache
+        self.overlaps = SparseOverlaps(
+            ((cage1, cage2), Overlap(points))
+            for (cage1, cage2), points in overlap_points(self.cages).items())
+        self.graph = ConstraintGraph(self.cages, self.overlaps)
+
+    @property
+    def _overlaps(self):
+        ''' The overlaps as plain lists of (i, j) tuples, derived on demand '''
+        return SparseOverlaps((key, [tuple(p) for p in overlap.tolist()])
+                              for key, overlap in self.overlaps.items())
+
     def neighbors(self, cage):
-        """Given a cage, return set of overlapping cages."""
-        return {
-            other_cage for other_cage in self.cages
-            if cage != other_cage and
-                self.overlaps[cage, other_cage]
-            }
+        """Given a cage, return the (frozen) set of overlapping cages."""
+        return self.graph.neighbors(cage)
 
     def __repr__(self):       return f"Kenken({self.N}x{self.N}, {len(self.cages)} cages)"
     def __iter__(self):       return iter(self.cages)
@@ -0,0 +1,49 @@
+''' Run a student CrosswordCreator on a Kenken.
+
+The notebooks wrap a creator by subclassing it and pointing its crossword at
+the Kenken. kenken_solver() builds that wrapper for any creator class, and can
+swap in the heap-based MRV/degree variable selection (variable_order), and
+emit search events to solver_events hooks.
+'''
+from solver_events import Hooks, hook_creator
+from solver_stats import count_creator
+from variable_order import VariableOrder
+
+def kenken_solver(creator, heap_ordering: bool = False):
+    ''' Returns a KenkenSolver class inheriting ac3 and backtracking from `creator`.
+
+    heap_ordering=True replaces the creator's select_unassigned_variable with a
+    VariableOrder. Student code replaces domain sets freely, so the heap is
+    synced by domain size and by the assignment on each call (n len() reads)
+    instead of sorting every variable and rebuilding neighbour sets.
+
+    KenkenSolver(kenken, hooks=hooks) wraps the instance's revise, ac3 and
+    backtrack to emit events (solver_events.hook_creator); without hooks the
+    creator's methods run untouched.
+
+    Every instance has a SolverStats in self.stats: the creator's own if it keeps
+    one (pcoster), otherwise one counted by solver_stats.count_creator.
+    '''
+    class KenkenSolver(creator):  # Inherit the ac3 and backtracking algorithms..
+        def __init__(self, kenken, hooks: Hooks = None):
+            self.kenken = kenken
+            self.crossword = kenken
+            self.crossword.variables = self.kenken
+            super().__init__(self.kenken)
+            self.domains = {var: var.domain for var in kenken.variables}
+            self.order = None
+            if heap_ordering:
+                self.order = VariableOrder({var: len(domain) for var, domain in self.domains.items()},
+                                           kenken.graph.degree)
+            if getattr(self, 'stats', None) is None:
+                count_creator(self)
+            if hooks is not None:
+                hook_creator(self, hooks)
+
+        if heap_ordering:
+            def select_unassigned_variable(self, assignment):
+                domains = self.domains
+                self.order.sync(((var, len(domains[var])) for var in domains), assignment)
+                return self.order.peek()
+
+    return KenkenSolver
@@ -0,0 +1,215 @@
+''' Solve one puzzle with several configurations at once and keep the first verified answer.
+
+Runtimes differ wildly between the student creators and the generic Solver
+modes, and from puzzle to puzzle; no single configuration is best. The
+portfolio starts every configuration in its own process, takes the first
+solution that checks out against the puzzle, and terminates the rest.
+
+    python portfolio.py assets/kenken_puzzles/puzzle_9.txt
+    python portfolio.py assets/crossword_data/structure2.txt assets/crossword_data/words2.txt
+
+A puzzle is a kenken file path, or a (structure file, words file) pair for a
+crossword. Workers load the puzzle themselves and send back plain data: a
+kenken grid {(row, col): digit}, or crossword words {(i, j, direction): word}.
+'''
+import contextlib
+import importlib
+import inspect
+import io
+import multiprocessing as mp
+import os
+import queue
+import sys
+import time
+from pathlib import Path
+from typing import Dict, List, NamedTuple, Optional, Tuple, Union
+
+sys.path.append(str(Path(__file__).parent / 'generic'))
+
+Puzzle = Union[str, Tuple[str, str]]
+POLL = 0.5      # seconds between checks that the workers are still alive
+
+class Config(NamedTuple):
+    ''' kind is 'creator' (options: module, heap_ordering), 'solver' (options are
+    passed to the generic Solver) or 'cell' (the generic CellModel) '''
+    name: str
+    kind: str
+    options: dict = {}
+
+class PortfolioResult(NamedTuple):
+    winner: Optional[str]       # name of the configuration that solved first
+    solution: Optional[dict]    # its verified solution
+    elapsed: float              # wall time of the whole portfolio, seconds
+    outcomes: Dict[str, str]    # config name -> solved / no solution / invalid / error / died / cancelled / timeout
+
+KENKEN_CREATORS = ('pcoster', 'verano_20', 'marcoshernanz')
+CROSSWORD_CREATORS = ('pcoster', 'verano_20', 'hadeeer98', 'chezslice', 'marcoshernanz', 'iron8kid')
+
+def is_crossword(puzzle: Puzzle) -> bool:
+    return not isinstance(puzzle, (str, os.PathLike))
+
+def default_configs(puzzle: Puzzle) -> List[Config]:
+    if is_crossword(puzzle):
+        return [Config(name, 'creator', dict(module=name)) for name in CROSSWORD_CREATORS]
+    return [Config(name, 'creator', dict(module=name)) for name in KENKEN_CREATORS] + [
+        Config('pcoster+heap', 'creator', dict(module='pcoster', heap_ordering=True)),
+        Config('solver:bitset', 'solver', dict(trail=True, ac='bitset')),
+        Config('solver:bitset+alldiff+heap', 'solver', dict(trail=True, ac='bitset', alldiff=True, heap=True)),
+        Config('solver:wdeg+restarts', 'solver', dict(trail=True, iterative=True, ac='bitset',
+                                                       wdeg=True, restarts=16, seed=0)),
+        Config('solver:cbj', 'solver', dict(trail=True, ac='bitset', cbj=True)),
+        Config('cell', 'cell'),
+    ]
+
+def _solve_kenken(path, config: Config) -> Optional[dict]:
+    if config.kind == 'creator':
+        from kenken import Kenken
+        from kenken_solver import kenken_solver
+        options = dict(config.options)
+        creator = importlib.import_module(f"crossword_creators.{options.pop('module')}").CrosswordCreator
+        kenken = Kenken(path)
+        solver = kenken_solver(creator, **options)(kenken)
+        assignment = solver.backtrack(dict()) if solver.ac3() is not False else None
+    else:
+        from generic_kenken import Kenken
+        from generic_solve import solve
+        kenken = Kenken(str(path))
+        model = 'cell' if config.kind == 'cell' else 'cage'
+        assignment = solve(kenken, model, **config.options)
+    if not assignment:
+        return None
+    return {cell: int(digit) for cage, vector in assignment.items()
+            for cell, digit in zip(cage.cells, vector)}
+
+def _solve_crossword(structure, words, config: Config) -> Optional[dict]:
+    from crossword import Crossword
+    creator = importlib.import_module(f"crossword_creators.{config.options['module']}").CrosswordCreator(
+        Crossword(structure, words))
+    # some creators take solve(interleaving), the rest solve()
+    if len(inspect.signature(creator.solve).parameters) == 1:
+        assignment = creator.solve(True)
+    else:
+        assignment = creator.solve()
+    if not assignment:
+        return None
+    return {(var.i, var.j, var.direction): word for var, word in assignment.items()}
+
+def _worker(puzzle: Puzzle, config: Config, results):
+    start = time.perf_counter()
+    try:
+        with contextlib.redirect_stdout(io.StringIO()):
+            if is_crossword(puzzle):
+                solution = _solve_crossword(*puzzle, config)
+            else:
+                solution = _solve_kenken(puzzle, config)
+        status = 'solved' if solution else 'no solution'
+    except Exception as error:
+        solution, status = None, f'error: {error!r}'
+    results.put((config.name, status, solution, time.perf_counter() - start))
+
+def verify(puzzle: Puzzle, solution: dict) -> bool:
+    ''' Check a worker's answer against the puzzle itself, not against the worker '''
+    if not is_crossword(puzzle):
+        from kenken import read_structure, is_solution
+        return is_solution(read_structure(puzzle), solution)
+    from crossword import Crossword
+    crossword = Crossword(*puzzle)
+    words = {(var.i, var.j, var.direction): var for var in crossword.variables}
+    if set(solution) != set(words) or len(set(solution.values())) != len(solution):
+        return False
+    letters = {}
+    for key, word in solution.items():
+        var = words[key]
+        if word not in crossword.words or len(word) != var.length:
+            return False
+        for cell, letter in zip(var.cells, word):
+            if letters.setdefault(cell, letter) != letter:
+                return False
+    return True
+
+def _next_result(results, running: Dict[str, mp.Process], outcomes: Dict[str, str], deadline: Optional[float]):
+    ''' The next worker message, or None once the deadline passes or no worker is left.
+    A worker only exits after sending its message, so one that exited without it
+    died (killed, crashed or os._exit): it is marked so and dropped from `running`. '''
+    while running:
+        wait = POLL if deadline is None else min(POLL, max(0.0, deadline - time.perf_counter()))
+        try:
+            return results.get(timeout=wait)
+        except queue.Empty:
+            pass
+        if deadline is not None and time.perf_counter() >= deadline:
+            return None
+        dead = [name for name, process in running.items() if process.exitcode is not None]
+        if dead:
+            try:
+                return results.get(timeout=POLL)   # sent just before exiting
+            except queue.Empty:
+                pass
+            for name in dead:
+                process = running.pop(name)
+                process.join()
+                outcomes[name] = f'died (exit code {process.exitcode})'
+    return None
+
+def solve_portfolio(puzzle: Puzzle, configs: List[Config] = None, workers: int = None,
+                    timeout: float = None, verbose: bool = False) -> PortfolioResult:
+    ''' Run `configs` (default_configs) on `puzzle`, at most `workers` at a time (default:
+    all of them, time-sharing the cores if there are fewer), and return the first
+    verified solution; every other worker is then terminated. '''
+    configs = default_configs(puzzle) if configs is None else list(configs)
+    workers = workers or len(configs)
+    # import what the workers need once here, so forked workers start warm
+    if is_crossword(puzzle):
+        import crossword
+    else:
+        import kenken, kenken_solver, generic_solve
+    ctx = mp.get_context()
+    results = ctx.Queue()
+    waiting = list(configs)
+    running: Dict[str, mp.Process] = {}
+    outcomes = {config.name: 'cancelled' for config in configs}
+    start = time.perf_counter()
+    deadline = None if timeout is None else start + timeout
+    winner = solution = None
+    try:
+        while (waiting or running) and winner is None:
+            while waiting and len(running) < workers:
+                config = waiting.pop(0)
+                process = ctx.Process(target=_worker, args=(puzzle, config, results), daemon=True)
+                process.start()
+                running[config.name] = process
+            message = _next_result(results, running, outcomes, deadline)
+            if message is None:
+                if not running:     # every started worker died; start the next ones
+                    continue
+                for name in running:
+                    outcomes[name] = 'timeout'
+                break
+            name, status, answer, elapsed = message
+            running.pop(name).join()
+            if status == 'solved' and not verify(puzzle, answer):
+                status = 'invalid'
+            outcomes[name] = f'{status} ({elapsed*1000:,.0f} ms)'
+            if verbose:
+                print(f'{name:>28}: {outcomes[name]}')
+            if status == 'solved':
+                winner, solution = name, answer
+    finally:
+        for process in running.values():
+            process.terminate()
+        for process in running.values():
+            process.join()
+    return PortfolioResult(winner, solution, time.perf_counter() - start, outcomes)
+
+def main():
+    if len(sys.argv) not in (2, 3):
+        print(__doc__)
+        sys.exit(1)
+    puzzle = sys.argv[1] if len(sys.argv) == 2 else (sys.argv[1], sys.argv[2])
+    result = solve_portfolio(puzzle, verbose=True)
+    print(f'\nwinner: {result.winner} after {result.elapsed*1000:,.0f} ms')
+    for name, outcome in result.outcomes.items():
+        print(f'{name:>28}: {outcome}')
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,254 @@
+''' Seeded random KenKen puzzles and crossword structures, for benchmarks and tests.
+
+    python puzzle_generator.py kenken --sizes 4 6 8 --count 5 --seed 0 --output generated/
+    python puzzle_generator.py crossword --height 15 --width 15 --density 0.4 --count 3 --output generated/
+
+A KenKen starts from a random Latin square (a cyclic square with shuffled rows,
+columns and symbols), cut into random connected cages, each given an operator
+its digits satisfy. Cages are written one (op, target, cells) tuple per line, as
+in assets/kenken_puzzles. A board is then made unique: while the generic Solver
+counts more than one solution, it finds a solution that differs from the square
+and splits the cage holding a differing cell in two, which only ever removes
+solutions. At worst every cage becomes a given, so this always ends.
+
+A crossword structure is carved from a blocked grid, one straight slot at a
+time, until the open fraction of the grid reaches `density` (or no slot fits).
+Slots only cross at right angles and never touch side by side, so every run
+of open cells is a slot that was carved. Slot lengths can be limited to the
+word lengths of a words file, but the structure is not checked for a fill.
+'''
+import argparse
+import math
+import random
+import sys
+import tempfile
+from pathlib import Path
+from typing import Collection, Dict, List, NamedTuple, Optional, Tuple
+
+sys.path.append(str(Path(__file__).parent / 'generic'))
+
+Cell = Tuple[int, int]
+Clue = Tuple[str, int, Tuple[Cell, ...]]    # (op, target, cells) as written to puzzle files
+
+def latin_square(n: int, rng: random.Random) -> List[List[int]]:
+    rows, cols, symbols = list(range(n)), list(range(n)), list(range(1, n + 1))
+    rng.shuffle(rows), rng.shuffle(cols), rng.shuffle(symbols)
+    return [[symbols[(rows[i] + cols[j]) % n] for j in range(n)] for i in range(n)]
+
+def _neighbours(cell: Cell, n: int) -> List[Cell]:
+    r, c = cell
+    return [(r + dr, c + dc) for dr, dc in ((-1, 0), (1, 0), (0, -1), (0, 1))
+            if 0 <= r + dr < n and 0 <= c + dc < n]
+
+def random_cages(n: int, rng: random.Random, max_cage: int = 4) -> List[List[Cell]]:
+    ''' Partition the n x n grid into connected cages of at most `max_cage` cells.
+    Sizes are drawn with two and three cells most likely, and a cage that runs
+    out of free neighbours stays smaller. '''
+    sizes = list(range(1, max_cage + 1))
+    weights = [1] + [max_cage + 2 - size for size in sizes[1:]]
+    free = {(r, c) for r in range(n) for c in range(n)}
+    cages = []
+    for start in rng.sample(sorted(free), len(free)):
+        if start not in free:
+            continue
+        size = rng.choices(sizes, weights)[0]
+        cage = [start]
+        free.discard(start)
+        while len(cage) < size:
+            frontier = sorted({nb for cell in cage for nb in _neighbours(cell, n) if nb in free})
+            if not frontier:
+                break
+            cell = rng.choice(frontier)
+            cage.append(cell)
+            free.discard(cell)
+        cages.append(sorted(cage))
+    return cages
+
+def clue(cells: List[Cell], square: List[List[int]], rng: random.Random) -> Clue:
+    ''' A random operator the digits of `cells` satisfy, with its target '''
+    digits = [square[r][c] for r, c in cells]
+    if len(digits) == 1:
+        return ('=', digits[0], tuple(cells))
+    if len(digits) == 2:
+        low, high = sorted(digits)
+        ops = ['-', '+', '*'] + (['/', '/'] if high % low == 0 else [])   # favour / where it fits
+        op = rng.choice(ops)
+    else:
+        op = rng.choice(['+', '*'])
+    target = {'+': sum(digits), '*': math.prod(digits),
+              '-': max(digits) - min(digits), '/': max(digits) // min(digits)}[op]
+    return (op, target, tuple(cells))
+
+def _split(cage: List[Cell], cell: Cell, n: int, rng: random.Random) -> List[List[Cell]]:
+    ''' Cut `cage` into a connected piece of about half its cells grown from `cell`,
+    and the connected components of the rest '''
+    inside = set(cage)
+    piece = [cell]
+    while len(piece) < len(cage) // 2:
+        frontier = sorted({nb for c in piece for nb in _neighbours(c, n) if nb in inside and nb not in piece})
+        if not frontier:
+            break
+        piece.append(rng.choice(frontier))
+    rest = inside.difference(piece)
+    parts = [sorted(piece)]
+    while rest:
+        component, stack = [], [rest.pop()]
+        while stack:
+            c = stack.pop()
+            component.append(c)
+            for nb in _neighbours(c, n):
+                if nb in rest:
+                    rest.discard(nb)
+                    stack.append(nb)
+        parts.append(sorted(component))
+    return parts
+
+
+class KenkenInstance(NamedTuple):
+    clues: List[Clue]
+    solution: Dict[Cell, int]   # the Latin square the clues were cut from
+    splits: int                 # cages split to make the solution unique
+
+    @property
+    def N(self) -> int:
+        return 1 + max(r for _, _, cells in self.clues for r, _ in cells)
+
+    def lines(self) -> List[str]:
+        return [repr(clue) for clue in self.clues]
+
+    def write(self, path) -> Path:
+        path = Path(path)
+        path.write_text('\n'.join(self.lines()) + '\n')
+        return path
+
+
+def _load(clues: List[Clue], directory: str, cache):
+    from generic_kenken import Kenken
+    path = Path(directory) / 'board.txt'
+    path.write_text('\n'.join(map(repr, clues)) + '\n')
+    return Kenken(str(path), cache=cache)
+
+def _other_solution(csp, solution: Dict[Cell, int]) -> Optional[Dict[Cell, int]]:
+    ''' A solution of `csp` that differs from `solution`: one is found with some cage
+    barred from its value in `solution`, trying every cage of two or more cells '''
+    from generic_solver import Solver
+    for cage in csp.cages:
+        if len(cage.cells) == 1:
+            continue
+        solver = Solver(csp, trail=True, ac='bitset')
+        intended = solver.domains[cage].table.row_of(tuple(solution[cell] for cell in cage.cells))
+        solver.domains[cage].discard_row(intended)
+        found = solver.solve(verbose=False)
+        if found:
+            return {cell: int(digit) for var, vector in found.items() for cell, digit in zip(var.cells, vector)}
+    return None
+
+def generate_kenken(n: int, seed=None, max_cage: int = 4, unique: bool = True) -> KenkenInstance:
+    ''' A random n x n KenKen whose solution is unique (unless unique=False) '''
+    from domain_cache import DomainCache
+    from generic_solver import Solver
+    assert 3 <= n <= 12, 'puzzle sizes run from 3 to 12'
+    rng = random.Random(seed)
+    square = latin_square(n, rng)
+    solution = {(r, c): square[r][c] for r in range(n) for c in range(n)}
+    cages = random_cages(n, rng, max_cage)
+    clues = [clue(cells, square, rng) for cells in cages]
+    splits = 0
+    cache = DomainCache()   # in memory: random cages would only bloat the shared cache
+    with tempfile.TemporaryDirectory() as directory:
+        while unique and not Solver(_load(clues, directory, cache), trail=True, ac='bitset').is_unique():
+            other = _other_solution(_load(clues, directory, cache), solution)
+            cell = rng.choice(sorted(cell for cell in solution if other[cell] != solution[cell]))
+            i = next(i for i, cells in enumerate(cages) if cell in cells)
+            parts = _split(cages[i], cell, n, rng)
+            cages[i:i + 1] = parts
+            clues[i:i + 1] = [clue(cells, square, rng) for cells in parts]
+            splits += 1
+    return KenkenInstance(clues, solution, splits)
+
+
+def generate_structure(height: int, width: int, density: float = 0.4, seed=None, min_length: int = 3,
+                       max_length: int = None, lengths: Collection[int] = None) -> List[str]:
+    ''' Crossword structure lines ('_' open, '#' blocked) with about `density` of the
+    cells open. Slots are min_length..max_length long, and only of `lengths` if given. '''
+    rng = random.Random(seed)
+    max_length = max_length or max(height, width)
+    allowed = [k for k in range(max(min_length, 2), max_length + 1) if lengths is None or k in lengths]
+    assert allowed, 'no slot length fits the grid and the words'
+    open_cells, across, down = set(), set(), set()
+
+    def fits(cells, ends, side, own):
+        inside = lambda c: 0 <= c[0] < height and 0 <= c[1] < width
+        if not all(map(inside, cells)) or any(end in open_cells for end in ends if inside(end)):
+            return False
+        for cell in cells:
+            if cell in open_cells:
+                if cell in own:     # runs along an existing slot
+                    return False
+            elif any(nb in open_cells for nb in side(cell)):
+                return False        # would touch a parallel slot
+        return not open_cells or any(cell in open_cells for cell in cells)   # stay connected
+
+    for _ in range(50 * height * width):
+        if len(open_cells) >= density * height * width:
+            break
+        length = rng.choice(allowed)
+        r, c = rng.randrange(height), rng.randrange(width)
+        if rng.random() < 0.5:
+            cells = [(r, c + k) for k in range(length)]
+            ends = [(r, c - 1), (r, c + length)]
+            side = lambda cell: [(cell[0] - 1, cell[1]), (cell[0] + 1, cell[1])]
+            own = across
+        else:
+            cells = [(r + k, c) for k in range(length)]
+            ends = [(r - 1, c), (r + length, c)]
+            side = lambda cell: [(cell[0], cell[1] - 1), (cell[0], cell[1] + 1)]
+            own = down
+        if fits(cells, ends, side, own):
+            open_cells.update(cells)
+            own.update(cells)
+    return [''.join('_' if (i, j) in open_cells else '#' for j in range(width)) for i in range(height)]
+
+def write_structure(lines: List[str], path) -> Path:
+    path = Path(path)
+    path.write_text('\n'.join(lines) + '\n')
+    return path
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0].strip(),
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    kinds = parser.add_subparsers(dest='kind', required=True)
+    kenken = kinds.add_parser('kenken', help='unique-solution KenKen puzzles')
+    kenken.add_argument('--sizes', type=int, nargs='+', default=[4, 6, 8], help='N of each puzzle, 3..12')
+    kenken.add_argument('--max-cage', type=int, default=4, help='largest cage (default 4)')
+    crossword = kinds.add_parser('crossword', help='crossword structure files')
+    crossword.add_argument('--height', type=int, default=13)
+    crossword.add_argument('--width', type=int, default=13)
+    crossword.add_argument('--density', type=float, default=0.4, help='target fraction of open cells')
+    crossword.add_argument('--words', help='only carve slots as long as some word in this file')
+    for sub in (kenken, crossword):
+        sub.add_argument('--count', type=int, default=1, help='puzzles per setting (default 1)')
+        sub.add_argument('--seed', type=int, default=0, help='seed of the first puzzle; the rest follow on')
+        sub.add_argument('--output', default='.', help='directory to write into (default: here)')
+    args = parser.parse_args()
+
+    output = Path(args.output)
+    output.mkdir(parents=True, exist_ok=True)
+    if args.kind == 'kenken':
+        for n in args.sizes:
+            for seed in range(args.seed, args.seed + args.count):
+                instance = generate_kenken(n, seed, args.max_cage)
+                path = instance.write(output / f'kenken_{n}_{seed}.txt')
+                print(f'{path}: {len(instance.clues)} cages, {instance.splits} splits')
+    else:
+        lengths = None
+        if args.words:
+            lengths = {len(word) for word in Path(args.words).read_text().split()}
+        for seed in range(args.seed, args.seed + args.count):
+            lines = generate_structure(args.height, args.width, args.density, seed, lengths=lengths)
+            path = write_structure(lines, output / f'structure_{args.height}x{args.width}_{seed}.txt')
+            print(f'{path}: {sum(line.count("_") for line in lines) / (args.height * args.width):.0%} open')
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,155 @@
+''' Search events for profiling a solve, and a Chrome trace sink for them.
+
+Callbacks are registered per event on a Hooks object, which is handed to a
+generic Solver (Solver(..., hooks=hooks)) or to a kenken_solver wrapper
+(KenkenSolver(kenken, hooks=hooks)). Without hooks nothing is emitted: the
+Solver skips one `is not None` test per site, and the wrapper installs its
+tracing methods only when it is given hooks.
+
+Events and their arguments:
+    on_assign(var, value, depth)      a value is tried for var
+    on_backtrack(var, depth)          that value is taken back
+    on_revise(var1, var2, revised)    an arc was revised
+    on_domain_wipeout(var1, var2)     revising var1 against var2 emptied var1
+    ac3_start(arcs)                   propagation starts from `arcs` arcs (None if unknown)
+    ac3_end(consistent)               ... and reaches a fixpoint, or a wipeout
+
+Unpaired events can be sampled, Hooks(sample={'on_revise': 100}) delivering
+every 100th revise; on_assign/on_backtrack and ac3_start/ac3_end come in pairs
+that open and close spans, and are always delivered.
+
+    hooks = Hooks(sample={'on_revise': 100})
+    trace = ChromeTrace(hooks)
+    Solver(kenken, trail=True, hooks=hooks).solve()
+    trace.save('solve.json')    # open in chrome://tracing or ui.perfetto.dev
+'''
+import json
+import os
+import time
+import types
+from typing import Callable, Dict, List
+
+EVENTS = ('on_assign', 'on_backtrack', 'on_revise', 'on_domain_wipeout', 'ac3_start', 'ac3_end')
+PAIRED = ('on_assign', 'on_backtrack', 'ac3_start', 'ac3_end')
+
+class Hooks:
+    ''' Event name -> callbacks, with optional sampling of unpaired events '''
+
+    def __init__(self, sample: Dict[str, int] = None):
+        sample = dict(sample or {})
+        assert not set(sample) & set(PAIRED), 'paired events open and close spans and cannot be sampled'
+        assert set(sample) <= set(EVENTS), f'unknown events {set(sample) - set(EVENTS)}'
+        self.sample = sample
+        self.seen: Dict[str, int] = dict.fromkeys(sample, 0)
+        self.callbacks: Dict[str, List[Callable]] = {event: [] for event in EVENTS}
+
+    def on(self, event: str, callback: Callable) -> Callable:
+        self.callbacks[event].append(callback)
+        return callback
+
+    def emit(self, event: str, *args):
+        every = self.sample.get(event)
+        if every:
+            self.seen[event] += 1
+            if self.seen[event] % every:
+                return
+        for callback in self.callbacks[event]:
+            callback(*args)
+
+    def __repr__(self):
+        return f"Hooks({sum(map(len, self.callbacks.values()))} callbacks, sample={self.sample})"
+
+
+class ChromeTrace:
+    ''' Records events as Chrome trace-event JSON: decisions and ac3 runs become
+    nested spans (a flame chart of the search tree), revisions and wipeouts
+    instant events. '''
+
+    def __init__(self, hooks: Hooks = None):
+        self.events: List[dict] = []
+        self.open: List[str] = []   # names of the spans not yet closed, innermost last
+        self.start = time.perf_counter()
+        self.pid = os.getpid()
+        if hooks is not None:
+            self.attach(hooks)
+
+    def attach(self, hooks: Hooks):
+        hooks.on('on_assign', lambda var, value, depth: self._begin(f'assign {var}', value=str(value), depth=depth))
+        hooks.on('on_backtrack', lambda var, depth: self._end())
+        hooks.on('ac3_start', lambda arcs: self._begin('ac3', arcs=arcs))
+        hooks.on('ac3_end', lambda consistent: self._end(consistent=consistent))
+        hooks.on('on_revise', lambda var1, var2, revised: self._instant('revise', arc=f'{var1} -> {var2}',
+                                                                          revised=revised))
+        hooks.on('on_domain_wipeout', lambda var1, var2: self._instant('wipeout', arc=f'{var1} -> {var2}'))
+
+    def _now(self) -> float:
+        return (time.perf_counter() - self.start) * 1e6    # microseconds
+
+    def _begin(self, name: str, **args):
+        self.open.append(name)
+        self.events.append(dict(name=name, ph='B', ts=self._now(), pid=self.pid, tid=0, args=args))
+
+    def _end(self, **args):
+        if self.open:
+            self.events.append(dict(name=self.open.pop(), ph='E', ts=self._now(), pid=self.pid, tid=0, args=args))
+
+    def _instant(self, name: str, **args):
+        self.events.append(dict(name=name, ph='i', s='t', ts=self._now(), pid=self.pid, tid=0, args=args))
+
+    def finish(self):
+        ''' Close the spans still open (the decisions of the solution) '''
+        while self.open:
+            self._end()
+
+    def to_dict(self) -> dict:
+        self.finish()
+        return dict(traceEvents=self.events, displayTimeUnit='ms')
+
+    def save(self, path):
+        with open(path, 'w') as file:
+            json.dump(self.to_dict(), file)
+
+    def __len__(self):      return len(self.events)
+    def __repr__(self):     return f"ChromeTrace({len(self.events)} events)"
+
+
+def hook_creator(creator, hooks: Hooks):
+    ''' Emit events from a student creator instance by wrapping its revise, ac3 and
+    backtrack methods on the instance. A backtrack call is a decision: on_assign
+    for the variable its caller just assigned, on_backtrack when it fails. Values
+    the creator rejects before recursing are not seen. '''
+    emit = hooks.emit
+    revise, ac3 = creator.revise, creator.ac3
+
+    def traced_revise(self, x, y):
+        revised = revise(x, y)
+        emit('on_revise', x, y, revised)
+        if revised and not self.domains[x]:
+            emit('on_domain_wipeout', x, y)
+        return revised
+
+    def traced_ac3(self, arcs=None):
+        emit('ac3_start', len(arcs) if arcs else None)    # None: the creator builds its own queue
+        consistent = ac3(arcs)
+        emit('ac3_end', consistent is not False)
+        return consistent
+
+    def traced(backtrack):
+        def traced_backtrack(self, assignment):
+            if not assignment:
+                return backtrack(assignment)
+            var = next(reversed(assignment))
+            depth = len(assignment)
+            emit('on_assign', var, assignment[var], depth)
+            result = backtrack(assignment)
+            if not result:
+                emit('on_backtrack', var, depth - 1)
+            return result
+        return traced_backtrack
+
+    creator.revise = types.MethodType(traced_revise, creator)
+    creator.ac3 = types.MethodType(traced_ac3, creator)
+    for name in ('backtrack', 'backtrack_ac3'):
+        if hasattr(creator, name):
+            setattr(creator, name, types.MethodType(traced(getattr(creator, name)), creator))
+    return creator
@@ -0,0 +1,129 @@
+''' Search counters kept on each solver instance.
+
+Module-level counters are shared by every creator in the process and never
+reset, so two solves (or two threads) add into the same numbers. A
+SolverStats lives on one solver and is reset by its owner; updating it is a
+plain attribute increment, cheap enough to leave on.
+
+pcoster, baseline and the generic Solver count into their own SolverStats.
+The other student creators count nothing themselves; count_creator() gives
+such an instance a SolverStats by wrapping its methods, and kenken_solver
+does so for every creator that lacks one.
+'''
+import json
+import time
+import types
+from contextlib import contextmanager
+from typing import Dict
+
+class SolverStats:
+    ''' nodes: search calls; assignments: values tried; failures: values refused
+    or wiped out; revisions: revise calls; checks: constraint checks; pruned:
+    values removed by propagation; max_depth: deepest partial assignment;
+    phases: seconds spent per named phase (node_consistency, ac3, search) '''
+    __slots__ = ('nodes', 'assignments', 'failures', 'revisions', 'checks', 'pruned', 'max_depth', 'phases')
+
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        self.nodes = self.assignments = self.failures = 0
+        self.revisions = self.checks = self.pruned = 0
+        self.max_depth = 0
+        self.phases: Dict[str, float] = {}
+
+    def node(self, depth: int):
+        ''' Count a search node `depth` assignments deep '''
+        self.nodes += 1
+        if depth > self.max_depth:
+            self.max_depth = depth
+
+    @contextmanager
+    def phase(self, name: str):
+        ''' Add the time spent in the block to phases[name] '''
+        start = time.perf_counter()
+        try:
+            yield self
+        finally:
+            self.phases[name] = self.phases.get(name, 0.0) + time.perf_counter() - start
+
+    def as_dict(self) -> dict:
+        counters = {name: getattr(self, name) for name in self.__slots__}
+        counters['phases'] = dict(self.phases)
+        return counters
+
+    def to_json(self) -> str:
+        return json.dumps(self.as_dict())
+
+    def __repr__(self):
+        return (f"SolverStats({self.nodes:,} nodes, {self.assignments:,} assignments, "
+                f"{self.revisions:,} revisions, {self.pruned:,} pruned, depth {self.max_depth})")
+
+
+def count_creator(creator, stats: SolverStats = None):
+    ''' Keep `stats` (a new SolverStats by default) on a creator instance as
+    creator.stats, by wrapping its solve, enforce_node_consistency, revise, ac3 and
+    backtrack methods on the instance, as solver_events.hook_creator does.
+
+    solve() resets the counters. Every backtrack call is a node, and one made with
+    a non-empty assignment is an assignment, which counts as a failure when it
+    returns no solution; values the creator refuses before recursing are not seen.
+    revise() counts a revision and the values it pruned. Constraint checks happen
+    inside the creator's revise, so `checks` stays 0. ac3 calls outside the search
+    are timed as the ac3 phase, the outermost backtrack call as the search phase. '''
+    stats = creator.stats = stats if stats is not None else SolverStats()
+    searching = False
+    revise, ac3, node_consistency = creator.revise, creator.ac3, creator.enforce_node_consistency
+
+    def counted_revise(self, x, y):
+        size = len(self.domains[x])
+        revised = revise(x, y)
+        stats.revisions += 1
+        stats.pruned += size - len(self.domains[x])
+        return revised
+
+    def counted_ac3(self, *args, **kwargs):
+        if searching:
+            return ac3(*args, **kwargs)
+        with stats.phase('ac3'):
+            return ac3(*args, **kwargs)
+
+    def counted_node_consistency(self):
+        with stats.phase('node_consistency'):
+            return node_consistency()
+
+    def counted(backtrack):
+        def counted_backtrack(self, assignment):
+            nonlocal searching
+            depth = len(assignment)
+            stats.node(depth)
+            if depth:
+                stats.assignments += 1
+            if searching:
+                result = backtrack(assignment)
+            else:
+                searching = True
+                try:
+                    with stats.phase('search'):
+                        result = backtrack(assignment)
+                finally:
+                    searching = False
+            if depth and not result:
+                stats.failures += 1
+            return result
+        return counted_backtrack
+
+    if hasattr(creator, 'solve'):
+        solve = creator.solve
+
+        def counted_solve(self, *args, **kwargs):
+            stats.reset()
+            return solve(*args, **kwargs)
+        creator.solve = types.MethodType(counted_solve, creator)
+    creator.revise = types.MethodType(counted_revise, creator)
+    creator.ac3 = types.MethodType(counted_ac3, creator)
+    creator.enforce_node_consistency = types.MethodType(counted_node_consistency, creator)
+    for name in ('backtrack', 'backtrack_ac3'):
+        if hasattr(creator, name):
+            setattr(creator, name, types.MethodType(counted(getattr(creator, name)), creator))
+    return creator
@@ -0,0 +1,39 @@
+import sys
+from pathlib import Path
+sys.path.append(str(Path(__file__).parent.parent))
+import pytest
+from ac3_verifier import Fixpoint, check, compare, reference, verify_all
+from benchmark import puzzles
+from crossword import Crossword
+
+PUZZLES = puzzles()
+
+@pytest.mark.parametrize('number, sizes', [(0, [1, 1, 1, 1]), (1, [1, 2, 1, 1, 1, 2]),
+                                           (2, [414, 500, 500, 382, 490, 169]), (3, [2] * 10)])
+def test_crossword_reference(number, sizes):
+    # the sizes ac3_test.ipynb expects, in variable order
+    puzzle = PUZZLES[f'crossword{number}']
+    expected = reference(puzzle)
+    order = sorted(Crossword(*puzzle).variables, key=lambda var: var.id)
+    assert expected.consistent
+    assert [len(expected.domains[var.i, var.j, var.direction]) for var in order] == sizes
+
+def test_compare():
+    expected = Fixpoint(True, {'a': frozenset({1}), 'b': frozenset({2, 3})})
+    assert compare(expected, True, dict(expected.domains)) == ('ok', 0)
+    assert compare(expected, None, {'a': frozenset({1}), 'b': frozenset({2})}) == ('wrong', 1)
+    assert compare(expected, False, {'a': frozenset(), 'b': frozenset()})[0] == 'false wipeout'
+    assert compare(Fixpoint(False, {}), True, {}) == ('missed wipeout', 0)
+    assert compare(Fixpoint(False, {}), False, {'a': frozenset({9})}) == ('ok', 0)
+
+def test_creators_against_reference():
+    reports = verify_all(['pcoster', 'chezslice'], {name: PUZZLES[name] for name in ('crossword1', 'puzzle_3')})
+    status = {(entry.creator, entry.puzzle): entry for entry in reports}
+    assert status['pcoster', 'crossword1'].status == status['pcoster', 'puzzle_3'].status == 'ok'
+    assert status['pcoster', 'puzzle_3'].revisions > 0 and status['pcoster', 'puzzle_3'].rate > 0
+    # chezslice only runs its arc queue when it is given arcs
+    assert status['chezslice', 'crossword1'].status == 'wrong'
+
+def test_timeout():
+    entry = check('pcoster', PUZZLES['crossword2'], reference(PUZZLES['crossword2']), 'crossword2', timeout=0.01)
+    assert entry.status == 'timeout'
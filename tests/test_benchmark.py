@@ -0,0 +1,36 @@
+import copy
+import json
+import sys
+from pathlib import Path
+sys.path.append(str(Path(__file__).parent.parent))
+from benchmark import PHASES, benchmark, regressions, scaling
+
+def test_benchmark_measures_every_phase():
+    results = benchmark(['pcoster', 'solver:bitset'], ['crossword0', 'puzzle_3'], repeat=2)
+    json.dumps(results)
+    # the generic Solver only takes kenkens
+    assert [(entry['solver'], entry['puzzle']) for entry in results['results']] == \
+           [('pcoster', 'crossword0'), ('pcoster', 'puzzle_3'), ('solver:bitset', 'puzzle_3')]
+    for entry in results['results']:
+        assert entry['status'] == 'solved' and entry['nodes'] > 0
+        assert set(entry['median']) == set(entry['peak_memory']) == set(PHASES)
+        assert all(len(times) == 2 for times in entry['runs'].values())
+    assert regressions(results, results) == []
+
+def test_regressions_against_a_baseline():
+    current = benchmark(['solver:bitset'], ['puzzle_3'], repeat=1)
+    baseline = copy.deepcopy(current)
+    entry = baseline['results'][0]
+    entry['total'] /= 100
+    entry['nodes'] //= 2
+    found = regressions(baseline, current, floor=0)
+    assert len(found) == 2 and 'ms' in found[0] and 'nodes' in found[1]
+    current['results'][0]['status'] = 'deadline'
+    assert regressions(baseline, current) == ['solver:bitset on puzzle_3: deadline (was solved)']
+
+def test_scaling_reports_speedup_per_worker_count():
+    results = scaling(['puzzle_3'], workers=[1, 2], repeat=1)
+    json.dumps(results)
+    assert [entry['workers'] for entry in results] == [1, 2]
+    assert all(entry['status'] == 'solved' and entry['median'] > 0 for entry in results)
+    assert results[0]['speedup'] == 1.0 and results[1]['speedup'] > 0
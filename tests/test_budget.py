@@ -0,0 +1,55 @@
+import sys
+from pathlib import Path
+import pytest
+sys.path.append(str(Path(__file__).parent.parent))
+sys.path.append(str(Path(__file__).parent.parent / 'generic'))
+from budget import Budget, BudgetExhausted, budgeted, current_memory
+from crossword import Crossword
+from kenken import Kenken
+from kenken_solver import kenken_solver
+from generic_kenken import Kenken as CSP
+from generic_solver import Solver
+from crossword_creators import pcoster, iron8kid
+
+ASSETS = Path(__file__).parent.parent / 'assets'
+PUZZLE = ASSETS / 'kenken_puzzles' / 'puzzle_3.txt'
+CROSSWORD = (str(ASSETS / 'crossword_data' / 'structure2.txt'), str(ASSETS / 'crossword_data' / 'words2.txt'))
+
+def test_node_budget_stops_a_wrapped_creator(capsys):
+    solver = budgeted(kenken_solver(pcoster.CrosswordCreator))(Kenken(PUZZLE), budget=Budget(max_nodes=3))
+    solver.ac3()
+    result = solver.backtrack(dict())
+    assert isinstance(result, BudgetExhausted) and not result
+    assert result.reason == 'nodes' and result.nodes == 3
+
+def test_deadline_cuts_ac3_short(capsys):
+    creator = budgeted(iron8kid.CrosswordCreator)(Crossword(*CROSSWORD), budget=Budget(deadline=0.01))
+    result = creator.solve()
+    assert isinstance(result, BudgetExhausted) and result.reason == 'deadline'
+    assert result.elapsed < 5
+
+def test_generous_budget_changes_nothing(capsys):
+    solver = budgeted(kenken_solver(pcoster.CrosswordCreator))(Kenken(PUZZLE), budget=Budget(deadline=60))
+    plain = kenken_solver(pcoster.CrosswordCreator)(Kenken(PUZZLE))
+    solver.ac3(), plain.ac3()
+    grid = lambda assignment: {cage.cells: tuple(vector) for cage, vector in assignment.items()}
+    assert grid(solver.backtrack(dict())) == grid(plain.backtrack(dict()))
+    assert solver.budget.nodes > 0
+
+def test_memory_limit_reads_current_memory(capsys):
+    before = current_memory()
+    if before is None:
+        pytest.skip('no /proc on this platform')
+    block = b'\x01' * (400 * 2**20)     # raises the peak far above the limit below
+    del block
+    budget = Budget(max_memory=before + 200 * 2**20)
+    budget.check()
+    result = Solver(CSP(str(PUZZLE))).solve(budget=budget)
+    assert result and not isinstance(result, BudgetExhausted)
+
+def test_exhausted_results_carry_stats(capsys):
+    first = Budget(max_nodes=0).exhausted('nodes')
+    assert first.stats == {} and first.stats is not Budget(max_nodes=0).exhausted('nodes').stats
+    solver = budgeted(kenken_solver(pcoster.CrosswordCreator))(Kenken(PUZZLE), budget=Budget(max_nodes=3))
+    solver.ac3()
+    assert solver.backtrack(dict()).stats['nodes'] == solver.stats.nodes
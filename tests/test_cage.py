@@ -1,3 +1,5 @@
+import itertools
+import math
 import pytest
 import sys
 from pathlib import Path
@@ -46,7 +48,6 @@ def test_row_column_fidelity():
     assert((4,3,4) not in domain) # not valid
     assert((5,5,1) in domain) # valid
 
-import math
 def test_operation_fidelity():
     for cage in cages:
         op = cage.op
@@ -65,3 +66,24 @@ def test_length():
 
         
 
+def _brute_force_domain(cage):
+    ''' reference: filter every permutation of the repeated digit pool '''
+    rows_occupied, cols_occupied = zip(*cage.cells)
+    max_duplicates = min(len(set(rows_occupied)), len(set(cols_occupied)))
+    digit_pool = list(range(1, cage.N+1)) * max_duplicates
+    fn = math.prod if cage.op == 'x' else sum
+    return {p for p in itertools.permutations(digit_pool, len(cage.cells))
+            if cage._row_column_constraint_satisfied(p) and fn(p) == cage.target}
+
+def test_pruned_generator_matches_permutations():
+    extra = [
+        ('x', 84, ((0,0),(1,0),(1,1)), 7),
+        ('+', 15, ((0,0),(0,1),(1,0),(1,1)), 6),
+        ('x', 60, ((2,0),(2,1),(3,1),(3,2)), 5),
+        ('+', 3, ((0,0),), 4),
+    ]
+    test_cages = [c for c in cages if c.op in '+x']
+    test_cages += [Cage(op, target, cells, N) for (op, target, cells, N) in extra]
+    for cage in test_cages:
+        domain = set(tuple(v.tolist()) for v in cage.domain)
+        assert domain == _brute_force_domain(cage)
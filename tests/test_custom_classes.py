@@ -1,11 +1,18 @@
 import pytest
 import ast
-from kenken import Kenken, Cage
+import importlib
+from pathlib import Path
+from kenken import Kenken, Cage, read_structure, is_solution
+from kenken_solver import kenken_solver
+from portfolio import KENKEN_CREATORS
 from custom_classes import Vector, Overlap, VectorSlice
+from custom_classes import ConstraintGraph, DomainStore, DomainTable, SparseOverlaps, supported
 import copy
 import itertools
 import numpy as np
 
+PUZZLES = Path(__file__).parent.parent / 'assets' / 'kenken_puzzles'
+
 def test_overlap_class():
     data = [(1,10),(2,20), (3,30)]
     overlap = Overlap(data).to_numpy()
@@ -66,6 +73,27 @@ def test_vector_class_basics():
     assert len(domain) == 4
     assert {v1, v2, v3 } != {v1, v2, v3, v4}
 
+def test_vectors_never_equal_cages():
+    cage = Cage(op='+', target=3, cells=[(0,0), (0,1)], N=3)
+    vector = Vector([1,2])
+    vector.id = cage.id
+    assert cage != vector and vector != cage
+    assert vector not in {cage: vector}
+
+@pytest.mark.parametrize('name', KENKEN_CREATORS)
+def test_creators_solve_the_shipped_kenkens(name, capsys):
+    # one process, so vectors built for earlier puzzles count up the ids past the cage ids;
+    # marcoshernanz skips `value in assignment`, which must never match a cage
+    creator = importlib.import_module(f'crossword_creators.{name}').CrosswordCreator
+    for number in range(6 if name == 'marcoshernanz' else 5):
+        path = PUZZLES / f'puzzle_{number}.txt'
+        solver = kenken_solver(creator)(Kenken(path))
+        solver.enforce_node_consistency()
+        assignment = solver.backtrack(dict()) if solver.ac3() is not False else None
+        assert assignment, f'{name} found no solution for puzzle_{number}'
+        assert is_solution(read_structure(path), {cell: int(digit) for cage, vector in assignment.items()
+                                                  for cell, digit in zip(cage.cells, vector)})
+
 def test_other_vector_ops():
     vectors = set(item for item in itertools.product((1,2,3)) if len(set(item))>1)
 
@@ -130,3 +158,69 @@ def test_overlap_satisfied():
 
 
 
+
+def test_domain_store_set_behaviour():
+    store = DomainStore(np.array([[1,2],[2,1],[3,1]]))
+    v0, v1, v2 = list(store)
+    assert all(isinstance(v, Vector) for v in (v0, v1, v2))
+    assert len(store) == 3 and v1 in store
+    assert list(store) == [v0, v1, v2]            # candidates keep their identity
+    assert Vector([1,2]) not in store              # ... and are not compared by content
+
+    store.remove(v1)
+    assert v1 not in store and len(store) == 2
+    with pytest.raises(KeyError):
+        store.remove(v1)
+    smaller = store - {v0}
+    assert list(smaller) == [v2] and len(store) == 2
+    store -= {v2}
+    assert list(store) == [v0]
+    assert store == {v0}
+
+def test_domain_store_copies_share_candidates():
+    store = DomainStore(np.array([[1,2],[2,1]]))
+    copied = copy.deepcopy({'cage': store})['cage']
+    assert copied.table is store.table
+    v0, v1 = list(copied)
+    copied.discard(v0)
+    assert v0 in store and v0 not in copied
+    assert copy.copy(store) == store
+
+def test_domain_store_of_tuples():
+    store = DomainStore(DomainTable(np.array([[1,2],[2,1]]), tuple))
+    assert (1, 2) in store and (2, 2) not in store
+    store.remove((2, 1))
+    assert set(store) == {(1, 2)}
+
+def test_batched_supported_matches_vector_slices():
+    rng = np.random.default_rng(0)
+    for _ in range(50):
+        xs = rng.integers(1, 6, (rng.integers(0, 100), 4))
+        ys = rng.integers(1, 6, (rng.integers(0, 100), 3))
+        overlap = Overlap([(0,0),(2,1),(3,2)][:rng.integers(1, 4)])
+        position1, position2 = overlap
+        expected = [any(Vector(x.tolist())[position1] == Vector(y.tolist())[position2] for y in ys)
+                    for x in xs]
+        assert supported(xs, ys, overlap).tolist() == expected
+
+def test_constraint_graph_matches_overlap_scan():
+    kenken = Kenken('tests/test_board3.txt')
+    graph = kenken.graph
+    for i, cage in enumerate(kenken.cages):
+        expected = {other for other in kenken.cages
+                    if other != cage and kenken.overlaps[cage, other]}
+        assert kenken.neighbors(cage) == expected
+        assert kenken.neighbors(cage) is kenken.neighbors(cage)
+        assert graph.degree(cage) == len(expected)
+        assert {graph.order[j] for j in graph.neighbor_indices(i)} == expected
+        other = next(iter(expected))
+        assert kenken.neighbors(cage) - {other} == expected - {other}
+    assert isinstance(kenken.overlaps, SparseOverlaps)
+    assert kenken.overlaps['no', 'pair'] is None and ('no', 'pair') not in kenken.overlaps
+
+def test_constraint_graph_components():
+    graph = ConstraintGraph('abcde', {('a', 'b'): [(0, 0)], ('c', 'd'): [(0, 0)], ('d', 'c'): [(0, 0)],
+                                      ('a', 'e'): None})
+    assert graph.components() == [['a', 'b'], ['c', 'd'], ['e']]
+    kenken = Kenken('tests/test_board3.txt')
+    assert kenken.graph.components() == [kenken.cages]
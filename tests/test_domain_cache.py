@@ -0,0 +1,67 @@
+import sys
+from pathlib import Path
+sys.path.append(str(Path(__file__).parent.parent))
+import numpy as np
+import domain_cache
+from domain_cache import DomainCache
+from kenken import Kenken, Cage
+
+PUZZLE = Path(__file__).parent.parent / 'assets' / 'kenken_puzzles' / 'puzzle_3.txt'
+
+def as_tuples(cage):
+    return set(tuple(v.tolist()) for v in cage.domain)
+
+def test_key_is_translation_invariant():
+    k1 = DomainCache.key('x', 84, [(0,0),(1,0),(1,1)], 7)
+    k2 = DomainCache.key('x', 84, [(3,4),(4,4),(4,5)], 7)
+    k3 = DomainCache.key('x', 84, [(0,0),(1,0),(1,1)], 8)
+    assert k1 == k2
+    assert k1 != k3
+
+def test_cached_domain_matches_computed():
+    cache = DomainCache()
+    computed = Cage('x', 84, [(0,0),(1,0),(1,1)], 7)
+    first = Cage('x', 84, [(0,0),(1,0),(1,1)], 7, cache=cache)
+    second = Cage('x', 84, [(2,2),(3,2),(3,3)], 7, cache=cache)
+    assert cache.misses == 1 and cache.hits == 1
+    assert as_tuples(computed) == as_tuples(first) == as_tuples(second)
+
+def test_sqlite_store_persists(tmp_path):
+    path = tmp_path / 'domains.sqlite'
+    kenken = Kenken(PUZZLE, cache=DomainCache(path))
+    reloaded_cache = DomainCache(path)
+    reloaded = Kenken(PUZZLE, cache=reloaded_cache)
+    assert reloaded_cache.misses == 0
+    for cage1, cage2 in zip(kenken, reloaded):
+        assert as_tuples(cage1) == as_tuples(cage2)
+
+def test_lru_evicts_oldest():
+    cache = DomainCache(maxsize=2)
+    for target in (1, 2, 3):
+        cache.put(f'k{target}', np.array([[target]]))
+    assert len(cache) == 2
+    assert cache.get('k1') is None
+    assert cache.get('k3').tolist() == [[3]]
+
+def test_no_room_in_memory():
+    cache = DomainCache(maxsize=0)
+    first = Cage('x', 84, [(0,0),(1,0),(1,1)], 7, cache=cache)
+    second = Cage('x', 84, [(0,0),(1,0),(1,1)], 7, cache=cache)
+    assert len(cache) == 0 and cache.misses == 2
+    assert as_tuples(first) == as_tuples(second) == as_tuples(Cage('x', 84, [(0,0),(1,0),(1,1)], 7))
+
+def test_default_cache_stays_in_memory(monkeypatch, tmp_path):
+    monkeypatch.delenv('KENKEN_DOMAIN_CACHE', raising=False)
+    monkeypatch.setattr(domain_cache, '_default_cache', None)
+    assert domain_cache.default_cache().path is None
+    monkeypatch.setattr(domain_cache, '_default_cache', None)
+    monkeypatch.setenv('KENKEN_DOMAIN_CACHE', str(tmp_path / 'domains.sqlite'))
+    assert domain_cache.default_cache().path == tmp_path / 'domains.sqlite'
+
+def test_new_generator_version_skips_stored_rows(monkeypatch, tmp_path):
+    path = tmp_path / 'domains.sqlite'
+    Cage('x', 84, [(0,0),(1,0),(1,1)], 7, cache=DomainCache(path))
+    monkeypatch.setattr(domain_cache, 'DOMAIN_VERSION', domain_cache.DOMAIN_VERSION + 1)
+    cache = DomainCache(path)
+    Cage('x', 84, [(0,0),(1,0),(1,1)], 7, cache=cache)
+    assert cache.misses == 1 and cache.hits == 0
@@ -0,0 +1,310 @@
+import inspect
+import itertools
+import os
+import random
+import sys
+from pathlib import Path
+sys.path.append(str(Path(__file__).parent.parent / 'generic'))
+import pytest
+import numpy as np
+import generic_parallel
+from budget import Budget, BudgetExhausted
+from generic_alldiff import alldiff_prune
+from generic_cell_model import CompactTable, digits_of
+from generic_kenken import Kenken as CSP, OP_FUNC
+from generic_parallel import ParallelSolver, encode_domains, decode_domains
+from generic_solve import solve
+from generic_solver import Solver, luby
+
+PUZZLES = Path(__file__).parent.parent / 'assets' / 'kenken_puzzles'
+UNSAT = Path(__file__).parent / 'test_board4.txt'   # no solution, but ac3 alone cannot tell
+
+def load(number):
+    return CSP(str(PUZZLES / f'puzzle_{number}.txt'))
+
+def is_solution(csp, assignment):
+    grid = {}
+    for cage in csp:
+        vector = assignment[cage]
+        if cage.op == '=':
+            value = vector[0]
+        elif cage.op in '+x':
+            value = OP_FUNC[cage.op](vector)
+        else:
+            value = OP_FUNC[cage.op](*vector)
+        if value != cage.target:
+            return False
+        grid.update(zip(cage.cells, vector))
+    digits = set(range(1, csp.N + 1))
+    return all({grid[r, c] for c in range(csp.N)} == digits for r in range(csp.N)) and \
+           all({grid[r, c] for r in range(csp.N)} == digits for c in range(csp.N))
+
+@pytest.mark.parametrize('number', [1, 3, 4, 5])
+def test_trail_matches_deepcopy(number, capsys):
+    csp = load(number)
+    expected = Solver(csp).solve()
+    solver = Solver(csp, trail=True)
+    solution = solver.solve()
+    assert is_solution(csp, solution)
+    assert {c: tuple(v) for c, v in solution.items()} == {c: tuple(v) for c, v in expected.items()}
+
+def test_trail_restores_domains(capsys):
+    csp = load(3)
+    solver = Solver(csp, trail=True)
+    solver.ac3()
+    before = {var: set(d) for var, d in solver.domains.items()}
+    var = next(iter(solver.domains))
+    mark = len(solver.trail)
+    for value in list(solver.domains[var])[1:]:
+        solver.remove(var, value)
+    solver.ac3([(other, var) for other in csp.neighbors(var)])
+    solver.undo(mark)
+    assert {var: set(d) for var, d in solver.domains.items()} == before
+
+def test_assign_records_its_removals():
+    solver = Solver(load(6), trail=True, alldiff=True)
+    solver.enforce_node_consistency()
+    var = min((cage for cage in solver.domains if len(solver.domains[cage]) > 1),
+              key=lambda cage: len(solver.domains[cage]))
+    size, pruned = len(solver.domains[var]), solver.stats.pruned
+    solver.touched = set()
+    solver.propagate = lambda arcs=None: True   # the all-different pass would consume `touched`
+    solver.assign(var, next(iter(solver.domains[var])))
+    assert solver.stats.pruned - pruned >= size - 1 and var in solver.touched
+
+@pytest.mark.parametrize('number', [1, 3, 6, 9])
+def test_engines_reach_the_ac3_fixpoint(number):
+    csp = load(number)
+    fixpoints, checks = [], []
+    for ac in ('ac3', 'ac2001', 'batch', 'bitset'):
+        solver = Solver(csp, ac=ac)
+        assert solver.ac3()
+        fixpoints.append({var: set(domain) for var, domain in solver.domains.items()})
+        checks.append(solver.checks)
+    assert all(fixpoint == fixpoints[0] for fixpoint in fixpoints)
+    assert checks[1] < checks[0]
+
+def test_ac2001_solves(capsys):
+    csp = load(5)
+    assert is_solution(csp, Solver(csp, trail=True, ac='ac2001').solve())
+
+def test_compiled_bits_match_is_consistent():
+    csp = load(3)
+    csp.compile()
+    for (var1, var2), overlap in list(csp.overlaps.items()):
+        if overlap is None:
+            continue
+        for row1, vector1 in enumerate(var1.domain):
+            for row2, vector2 in enumerate(var2.domain):
+                assert csp.compatible(var1, var2, row1, row2) == csp.is_consistent(var1, var2, vector1, vector2)
+
+def test_bitset_solves(capsys):
+    csp = load(6)
+    expected = Solver(load(6)).solve()
+    solution = Solver(csp, trail=True, ac='bitset').solve()
+    assert is_solution(csp, solution)
+    assert {c.id: tuple(v) for c, v in solution.items()} == {c.id: tuple(v) for c, v in expected.items()}
+
+def test_alldiff_prune_matches_brute_force():
+    rng = random.Random(1)
+    for _ in range(500):
+        n = rng.randint(1, 5)
+        domains = [set(rng.sample(range(1, 7), rng.randint(1, 6))) for _ in range(n)]
+        solutions = [p for p in itertools.product(*domains) if len(set(p)) == n]
+        removals = alldiff_prune(domains)
+        if not solutions:
+            assert removals is None
+            continue
+        kept = {(i, d) for p in solutions for i, d in enumerate(p)}
+        assert sorted(removals) == sorted((i, d) for i, domain in enumerate(domains)
+                                          for d in domain if (i, d) not in kept)
+
+def test_alldiff_sees_pigeonholes():
+    # two cells restricted to {1, 2} force the third off 1 and 2
+    assert sorted(alldiff_prune([{1, 2}, {1, 2}, {1, 2, 3}])) == [(2, 1), (2, 2)]
+
+@pytest.mark.parametrize('number', [6, 9])
+def test_alldiff_prunes_at_least_as_much(number, capsys):
+    plain, strong = Solver(load(number)), Solver(load(number), alldiff=True)
+    assert plain.propagate() and strong.propagate()
+    sizes = lambda solver: sorted((var.id, len(domain)) for var, domain in solver.domains.items())
+    assert all(s <= p for (_, s), (_, p) in zip(sizes(strong), sizes(plain)))
+    assert is_solution(strong.csp, strong.solve())
+
+@pytest.mark.parametrize('trail', [False, True])
+def test_heap_ordering_solves(trail, capsys):
+    csp = load(6)
+    solver = Solver(csp, trail=trail, ac='bitset', heap=True)
+    assert is_solution(csp, solver.solve())
+    assert len(solver.order) == 0
+
+def test_counted_lcv_matches_scanned_order(capsys):
+    csp = load(9)
+    solver = Solver(csp, trail=True, ac='bitset', lcv='counts')
+    order_domain_values, mismatches = solver.order_domain_values, []
+    def checked(var, assignment):
+        values = order_domain_values(var, assignment)
+        expected = solver._order_domain_values_compiled(var)
+        mismatches.extend(v for v, e in zip(values, expected) if tuple(v) != tuple(e))
+        return values
+    solver.order_domain_values = checked
+    assert is_solution(csp, solver.solve())
+    assert solver.support and not mismatches
+
+@pytest.mark.parametrize('number, options', [(5, {}), (6, dict(ac='bitset', heap=True)),
+                                             (9, dict(ac='bitset', alldiff=True, lcv='counts'))])
+def test_iterative_matches_recursive(number, options, capsys):
+    runs = []
+    for iterative in (False, True):
+        solver = Solver(load(number), trail=True, iterative=iterative, **options)
+        solution = solver.solve()
+        runs.append(({c.id: tuple(v) for c, v in solution.items()},
+                     solver.nodes, solver.revisions, solver.checks))
+    assert runs[0] == runs[1]
+
+def test_iterative_is_not_bounded_by_recursion(capsys):
+    csp = load(9)
+    depth = len(inspect.stack())
+    limit = sys.getrecursionlimit()
+    try:
+        sys.setrecursionlimit(depth + len(csp.cages) // 2)
+        with pytest.raises(RecursionError):
+            Solver(csp, trail=True).solve()
+        assert is_solution(csp, Solver(csp, trail=True, iterative=True).solve())
+    finally:
+        sys.setrecursionlimit(limit)
+
+def test_luby_sequence():
+    assert [luby(i) for i in range(1, 16)] == [1, 1, 2, 1, 1, 2, 4, 1, 1, 2, 1, 1, 2, 4, 8]
+
+def test_wipeouts_bump_weights():
+    csp = load(3)
+    solver = Solver(csp, trail=True, wdeg=True)
+    assert solver.ac3()
+    var = csp.cages[0]
+    other = next(iter(csp.neighbors(var)))
+    mark = len(solver.trail)
+    for row in solver.domains[other].rows().tolist():
+        solver.remove_row(other, row)
+    assert not solver.ac3([(var, other)])
+    assert solver.weights[var, other] == solver.weights[other, var] == 2
+    solver.undo(mark)
+
+@pytest.mark.parametrize('number', [6, 8, 10])
+def test_wdeg_with_restarts_solves(number, capsys):
+    csp = load(number)
+    runs = []
+    for _ in range(2):
+        solver = Solver(csp, trail=True, iterative=True, ac='bitset', wdeg=True, restarts=1, seed=7)
+        assert is_solution(csp, solver.solve())
+        runs.append((solver.nodes, solver.failures, solver.runs))
+    assert runs[0] == runs[1]
+
+@pytest.mark.parametrize('number', [6, 9])
+def test_cbj_solves(number, capsys):
+    csp = load(number)
+    solver = Solver(csp, trail=True, ac='bitset', cbj=True)
+    assert is_solution(csp, solver.solve())
+    assert not solver.level_of or len(solver.level_of) == len(csp.cages)
+
+def test_cbj_proves_unsatisfiable(capsys):
+    chronological = Solver(CSP(str(UNSAT)), trail=True, iterative=True)
+    assert chronological.solve() is None and chronological.nodes > 1
+    solver = Solver(CSP(str(UNSAT)), trail=True, cbj=True)
+    assert solver.solve() is None
+    assert solver.backjumps > 0 and solver.nodes <= chronological.nodes
+    assert not solver.level_of and not solver.literals and not solver.explanations
+
+def test_count_solutions(tmp_path, capsys):
+    board = tmp_path / 'two_solutions.txt'
+    board.write_text("('+', 3, ((0, 0), (0, 1)))\n('+', 3, ((1, 0), (1, 1)))\n")
+    solver = Solver(CSP(str(board)), trail=True)
+    assert solver.count_solutions() == 2
+    assert solver.count_solutions(limit=1) == 1
+    assert not solver.is_unique()
+    assert all(len(domain) == 2 for domain in solver.domains.values())
+    assert Solver(CSP(str(UNSAT)), trail=True).count_solutions() == 0
+
+def test_count_solutions_multiplies_components(tmp_path, capsys):
+    # two blocks on the diagonal of a 4x4 grid share no row or column: two components
+    board = tmp_path / 'two_blocks.txt'
+    board.write_text("('+', 3, ((0, 0), (0, 1)))\n('+', 5, ((1, 0), (1, 1)))\n"
+                     "('*', 4, ((2, 2), (3, 2)))\n('-', 1, ((2, 3), (3, 3)))\n")
+    csp = CSP(str(board))
+
+    def brute_force(cages):
+        return sum(all(csp.is_consistent(x, y, u, v) for (x, u), (y, v) in itertools.combinations(zip(cages, values), 2))
+                   for values in itertools.product(*(list(cage.domain) for cage in cages)))
+    first, second = csp.graph.components()
+    brute = brute_force(csp.cages)
+    assert brute == brute_force(first) * brute_force(second) and brute_force(first) > 1 and brute_force(second) > 1
+    solver = Solver(CSP(str(board)), trail=True)
+    assert solver.count_solutions() == brute
+    assert solver.count_solutions(limit=brute - 1) == brute - 1
+
+@pytest.mark.parametrize('number', [3, 6, 9])
+def test_shipped_puzzles_are_unique(number):
+    assert Solver(load(number), trail=True, ac='bitset').is_unique()
+
+def test_budgets_stop_the_search(capsys):
+    solver = Solver(load(10), trail=True, iterative=True)
+    result = solver.solve(budget=Budget(max_nodes=5))
+    assert isinstance(result, BudgetExhausted) and not result
+    assert result.reason == 'nodes' and result.nodes == 5 and result.stats['nodes'] == 5
+    assert Solver(load(10), trail=True).solve(budget=Budget(deadline=0)).reason == 'deadline'
+    assert Solver(load(10)).solve(budget=Budget(max_memory=1)).reason == 'memory'
+    csp = load(6)
+    assert is_solution(csp, Solver(csp, trail=True).solve(budget=Budget(deadline=60, max_nodes=10**6)))
+
+def test_solver_stats(capsys):
+    csp = load(6)
+    solver = Solver(csp, trail=True, iterative=True, ac='bitset')
+    assert is_solution(csp, solver.solve())
+    stats = solver.stats.as_dict()
+    assert stats['nodes'] == solver.nodes and stats['revisions'] == solver.revisions
+    assert stats['max_depth'] == len(csp.cages) and stats['assignments'] >= len(csp.cages)
+    assert stats['pruned'] > 0 and set(stats['phases']) == {'node_consistency', 'ac3', 'search'}
+
+def test_domain_snapshots_round_trip():
+    csp = load(9)
+    solver = Solver(csp, trail=True)
+    solver.propagate()
+    alive = [solver.domains[cage].alive for cage in csp.cages]
+    decoded = decode_domains(csp.cages, encode_domains(alive))
+    assert all(np.array_equal(a, b) for a, b in zip(alive, decoded))
+
+@pytest.mark.parametrize('options', [dict(ac='bitset'), dict(ac='bitset', heap=True)])
+def test_parallel_solves(options, capsys):
+    csp = load(10)
+    parallel = ParallelSolver(csp, workers=2, split=1, **options)
+    assert is_solution(csp, parallel.solve())
+    assert parallel.tasks >= 1
+
+def test_parallel_proves_unsatisfiable(capsys):
+    parallel = ParallelSolver(CSP(str(UNSAT)), workers=3, split=1)
+    assert parallel.solve() is None
+    assert parallel.tasks >= 2
+
+def test_parallel_reports_dead_workers(monkeypatch, capsys):
+    monkeypatch.setattr(generic_parallel, '_search', lambda *args: os._exit(9))   # e.g. OOM-killed
+    with pytest.raises(RuntimeError, match='died'):
+        ParallelSolver(CSP(str(UNSAT)), workers=2, split=1).solve()
+
+def test_compact_table_filters_to_supported_digits():
+    # cage x6 over two cells of a 3x3: tuples (2,3), (3,2), (1,6) is out of range
+    table = CompactTable([0, 1], np.array([[2, 3], [3, 2]]), 3)
+    domains = [0b1110, 0b1110]
+    assert table.propagate(domains) == [0, 1]
+    assert [digits_of(d) for d in domains] == [[2, 3], [2, 3]]
+    domains[0] = 1 << 2
+    assert table.propagate(domains) == [1]
+    assert digits_of(domains[1]) == [3]
+    domains[1] = 1 << 2
+    assert table.propagate(domains) is None
+
+@pytest.mark.parametrize('number', [1, 4, 6, 9])
+def test_cell_model_matches_cage_model(number):
+    csp = load(number)
+    cell_solution = solve(csp, 'cell')
+    assert is_solution(csp, cell_solution)
+    assert cell_solution == solve(csp, 'cage', trail=True)
@@ -0,0 +1,38 @@
+import os
+import sys
+from pathlib import Path
+sys.path.append(str(Path(__file__).parent.parent))
+import portfolio
+from portfolio import Config, solve_portfolio, verify
+
+ASSETS = Path(__file__).parent.parent / 'assets'
+PUZZLE = str(ASSETS / 'kenken_puzzles' / 'puzzle_3.txt')
+CROSSWORD = (str(ASSETS / 'crossword_data' / 'structure0.txt'), str(ASSETS / 'crossword_data' / 'words0.txt'))
+
+def test_first_verified_solution_wins():
+    configs = [Config('solver', 'solver', dict(trail=True, ac='bitset')),
+               Config('broken', 'creator', dict(module='no_such_creator'))]
+    result = solve_portfolio(PUZZLE, configs, timeout=60)
+    assert result.winner == 'solver'
+    assert verify(PUZZLE, result.solution)
+    assert result.outcomes['broken'].startswith(('error', 'cancelled'))
+
+def test_verify_rejects_a_wrong_grid():
+    result = solve_portfolio(PUZZLE, [Config('cell', 'cell')], timeout=60)
+    grid = dict(result.solution)
+    a, b = (0, 0), (0, 1)
+    grid[a], grid[b] = grid[b], grid[a]
+    assert not verify(PUZZLE, grid)
+
+def test_dead_worker_does_not_hang(monkeypatch):
+    solve = portfolio._solve_kenken
+    monkeypatch.setattr(portfolio, '_solve_kenken',
+                        lambda path, config: os._exit(1) if config.name == 'crash' else solve(path, config))
+    result = solve_portfolio(PUZZLE, [Config('crash', 'cell')])
+    assert result.winner is None and result.outcomes['crash'] == 'died (exit code 1)'
+    result = solve_portfolio(PUZZLE, [Config('crash', 'cell'), Config('cell', 'cell')], workers=1)
+    assert result.winner == 'cell' and result.outcomes['crash'].startswith('died')
+
+def test_crossword_portfolio():
+    result = solve_portfolio(CROSSWORD, [Config('pcoster', 'creator', dict(module='pcoster'))], timeout=60)
+    assert result.winner == 'pcoster' and verify(CROSSWORD, result.solution)
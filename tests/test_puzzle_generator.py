@@ -0,0 +1,37 @@
+import sys
+from pathlib import Path
+sys.path.append(str(Path(__file__).parent.parent))
+sys.path.append(str(Path(__file__).parent.parent / 'generic'))
+import pytest
+from puzzle_generator import generate_kenken, generate_structure, write_structure
+from crossword import Crossword
+from generic_kenken import Kenken as CSP
+from generic_solver import Solver
+
+WORDS = Path(__file__).parent.parent / 'assets' / 'crossword_data' / 'words2.txt'
+
+@pytest.mark.parametrize('n', [3, 5, 7])
+def test_generated_kenken_is_unique(n, tmp_path):
+    instance = generate_kenken(n, seed=n)
+    assert instance == generate_kenken(n, seed=n)   # seeded
+    path = instance.write(tmp_path / 'puzzle.txt')
+    assert len(path.read_text().splitlines()) == len(instance.clues)
+    csp = CSP(str(path))
+    assert csp.N == n and sorted(cell for cage in csp for cell in cage.cells) == sorted(instance.solution)
+    assert Solver(csp, trail=True).is_unique()
+    found = Solver(CSP(str(path)), trail=True, ac='bitset').solve(verbose=False)
+    assert {cell: digit for cage, vector in found.items() for cell, digit in zip(cage.cells, vector)} == \
+           instance.solution
+
+def test_generated_structure(tmp_path):
+    lengths = {len(word) for word in WORDS.read_text().split()}
+    sparse = generate_structure(15, 15, density=0.2, seed=0, lengths=lengths)
+    dense = generate_structure(15, 15, density=0.45, seed=0, lengths=lengths)
+    assert sparse == generate_structure(15, 15, density=0.2, seed=0, lengths=lengths)
+    assert len(dense) == 15 and {len(line) for line in dense} == {15}
+    open_cells = lambda lines: sum(line.count('_') for line in lines)
+    assert 0.2 * 225 <= open_cells(sparse) < open_cells(dense)
+    crossword = Crossword(write_structure(dense, tmp_path / 'structure.txt'), WORDS)
+    assert crossword.variables and all(var.length in lengths for var in crossword.variables)
+    covered = {cell for var in crossword.variables for cell in var.cells}
+    assert len(covered) == open_cells(dense)    # every open cell belongs to a slot
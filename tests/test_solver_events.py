@@ -0,0 +1,73 @@
+import json
+import sys
+from pathlib import Path
+sys.path.append(str(Path(__file__).parent.parent))
+sys.path.append(str(Path(__file__).parent.parent / 'generic'))
+import pytest
+from solver_events import EVENTS, Hooks, ChromeTrace
+from generic_kenken import Kenken as CSP
+from generic_solver import Solver
+from kenken import Kenken
+from kenken_solver import kenken_solver
+from crossword_creators import pcoster
+
+ASSETS = Path(__file__).parent.parent / 'assets'
+UNSAT = Path(__file__).parent / 'test_board4.txt'   # no solution, but ac3 alone cannot tell
+
+def recorder(hooks):
+    seen = {event: [] for event in EVENTS}
+    for event in EVENTS:
+        hooks.on(event, lambda *args, event=event: seen[event].append(args))
+    return seen
+
+def balanced(trace):
+    depth = 0
+    for event in trace['traceEvents']:
+        depth += {'B': 1, 'E': -1}.get(event['ph'], 0)
+        assert depth >= 0
+    return depth == 0
+
+def test_sampling():
+    hooks = Hooks(sample={'on_revise': 10})
+    seen = recorder(hooks)
+    for i in range(25):
+        hooks.emit('on_revise', i, i, True)
+        hooks.emit('on_assign', i, i, 1)
+    assert [args[0] for args in seen['on_revise']] == [9, 19] and len(seen['on_assign']) == 25
+    with pytest.raises(AssertionError):
+        Hooks(sample={'on_backtrack': 2})
+
+@pytest.mark.parametrize('options', [dict(), dict(trail=True, iterative=True), dict(trail=True, cbj=True)])
+def test_solver_events(options, tmp_path, capsys):
+    hooks = Hooks()
+    seen = recorder(hooks)
+    trace = ChromeTrace(hooks)
+    solver = Solver(CSP(str(UNSAT)), hooks=hooks, **options)
+    assert solver.solve(verbose=False) is None
+    assert len(seen['on_assign']) == len(seen['on_backtrack']) == solver.stats.assignments
+    assert len(seen['on_revise']) == solver.revisions and seen['on_domain_wipeout']
+    assert len(seen['ac3_start']) == len(seen['ac3_end']) and seen['ac3_end'][0] == (True,)
+    trace.save(tmp_path / 'trace.json')
+    assert balanced(json.loads((tmp_path / 'trace.json').read_text()))
+
+def test_hooks_change_nothing(capsys):
+    plain = Solver(CSP(str(ASSETS / 'kenken_puzzles' / 'puzzle_6.txt')), trail=True)
+    hooked = Solver(CSP(str(ASSETS / 'kenken_puzzles' / 'puzzle_6.txt')), trail=True,
+                    hooks=Hooks(sample={'on_revise': 100}))
+    grid = lambda assignment: {cage.cells: tuple(vector) for cage, vector in assignment.items()}
+    assert grid(plain.solve(verbose=False)) == grid(hooked.solve(verbose=False))
+    assert plain.stats.as_dict().keys() == hooked.stats.as_dict().keys() and plain.nodes == hooked.nodes
+
+def test_wrapped_creator_events(capsys):
+    hooks = Hooks()
+    seen = recorder(hooks)
+    trace = ChromeTrace(hooks)
+    puzzle = ASSETS / 'kenken_puzzles' / 'puzzle_3.txt'
+    solver = kenken_solver(pcoster.CrosswordCreator)(Kenken(puzzle), hooks=hooks)
+    plain = kenken_solver(pcoster.CrosswordCreator)(Kenken(puzzle))
+    solver.ac3(), plain.ac3()
+    grid = lambda assignment: {cage.cells: tuple(vector) for cage, vector in assignment.items()}
+    assert grid(solver.backtrack(dict())) == grid(plain.backtrack(dict()))
+    assert len(seen['on_assign']) == len(solver.domains) and seen['on_revise']
+    assert 'revise' not in vars(plain)     # no hooks, no wrappers
+    assert balanced(trace.to_dict())
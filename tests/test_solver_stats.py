@@ -0,0 +1,67 @@
+import json
+import sys
+from pathlib import Path
+sys.path.append(str(Path(__file__).parent.parent))
+from crossword import Crossword
+from crossword_creators import baseline, pcoster, verano_20
+from kenken import Kenken
+from kenken_solver import kenken_solver
+from solver_stats import SolverStats, count_creator
+
+ASSETS = Path(__file__).parent.parent / 'assets'
+DATA = ASSETS / 'crossword_data'
+
+def creator(number):
+    return pcoster.CrosswordCreator(Crossword(DATA / f'structure{number}.txt', DATA / f'words{number}.txt'))
+
+def test_counters_live_on_the_instance(capsys):
+    first, second = creator(1), creator(1)
+    assert first.solve(False) and second.solve(True)
+    for stats in (first.stats, second.stats):
+        assert stats.nodes == len(first.domains) + 1 and stats.max_depth == len(first.domains)
+        assert stats.assignments >= len(first.domains) and stats.revisions > 0 and stats.checks > 0
+        assert set(stats.phases) == {'node_consistency', 'ac3', 'search'}
+    first.solve(False)
+    assert first.stats.nodes == second.stats.nodes   # solve() starts from zero again
+    assert not hasattr(pcoster, 'BACKTRACK_COUNTER') and not hasattr(pcoster, 'WORDS_TESTED')
+
+def test_baseline_counts_per_instance():
+    # baseline's ac3 cannot run (it calls a Crossword method that does not exist), its search can
+    first, second = (baseline.CrosswordCreator(Crossword(DATA / 'structure1.txt', DATA / 'words1.txt'))
+                     for _ in range(2))
+    for instance in (first, second):
+        instance.enforce_node_consistency()
+        assert instance.backtrack(dict())
+    assert first.stats.nodes == second.stats.nodes == len(first.domains) + 1
+    assert not hasattr(baseline, 'BACKTRACK_COUNTER') and not hasattr(baseline, 'WORDS_TESTED')
+
+def test_count_creator(capsys):
+    instance = count_creator(verano_20.CrosswordCreator(Crossword(DATA / 'structure1.txt', DATA / 'words1.txt')))
+    assert instance.solve()
+    assert instance.stats.nodes > 0 and instance.stats.max_depth > 0 and instance.stats.revisions > 0
+    assert set(instance.stats.phases) == {'node_consistency', 'ac3', 'search'}
+    instance.stats.nodes += 1000
+    instance.solve()
+    assert instance.stats.nodes < 1000    # solve() starts from zero again
+
+def test_every_kenken_solver_has_stats():
+    puzzle = ASSETS / 'kenken_puzzles' / 'puzzle_3.txt'
+    own = kenken_solver(pcoster.CrosswordCreator)(Kenken(puzzle))
+    counted = kenken_solver(verano_20.CrosswordCreator)(Kenken(puzzle))
+    assert 'revise' not in vars(own) and 'revise' in vars(counted)    # pcoster counts for itself
+    for solver in (own, counted):
+        solver.enforce_node_consistency()
+        assert solver.ac3() is not False and solver.backtrack(dict())
+        assert solver.stats.nodes > 0 and solver.stats.revisions > 0 and solver.stats.pruned > 0
+
+def test_stats_export():
+    stats = SolverStats()
+    stats.node(3)
+    stats.pruned += 2
+    with stats.phase('search'):
+        pass
+    exported = json.loads(stats.to_json())
+    assert exported['nodes'] == 1 and exported['max_depth'] == 3 and exported['pruned'] == 2
+    assert list(exported['phases']) == ['search']
+    stats.reset()
+    assert stats.as_dict()['nodes'] == 0 and stats.phases == {}
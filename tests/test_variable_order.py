@@ -0,0 +1,51 @@
+import sys
+from pathlib import Path
+sys.path.append(str(Path(__file__).parent.parent))
+import random
+from variable_order import VariableOrder
+from kenken import Kenken
+from kenken_solver import kenken_solver
+from crossword_creators.pcoster import CrosswordCreator
+
+PUZZLE = Path(__file__).parent.parent / 'assets' / 'kenken_puzzles' / 'puzzle_3.txt'
+
+def test_heap_matches_sorting():
+    rng = random.Random(0)
+    names = list('abcdefghijkl')
+    sizes = {v: rng.randint(1, 20) for v in names}
+    degrees = {v: rng.randint(0, 5) for v in names}
+    order = VariableOrder(sizes, degrees.get)
+    assigned = set()
+    for _ in range(500):
+        v = rng.choice(names)
+        action = rng.random()
+        if action < 0.5:
+            sizes[v] = rng.randint(1, 20)
+            order.update(v, sizes[v])
+        elif action < 0.75:
+            assigned.add(v); order.remove(v)
+        else:
+            assigned.discard(v); order.push(v)
+        unassigned = [v for v in names if v not in assigned]
+        assert len(order) == len(unassigned)
+        if unassigned:
+            expected = min(unassigned, key=lambda v: (sizes[v], -degrees[v], names.index(v)))
+            assert order.peek() == expected
+
+def test_sync_catches_up_with_replaced_domains():
+    order = VariableOrder({'a': 3, 'b': 2, 'c': 5}, lambda v: 0)
+    order.sync([('a', 1), ('b', 2), ('c', 5)], assigned={'b'})
+    assert order.peek() == 'a' and 'b' not in order
+    order.sync([('a', 1), ('b', 2), ('c', 0)], assigned={'a'})
+    assert order.peek() == 'c' and 'b' in order
+
+def test_wrapped_creator_with_heap_ordering():
+    solutions = []
+    for heap_ordering in (False, True):
+        kenken = Kenken(str(PUZZLE))
+        solver = kenken_solver(CrosswordCreator, heap_ordering=heap_ordering)(kenken)
+        assert solver.ac3()
+        solution = solver.backtrack(dict())
+        assert solution is not None and solver.consistent(solution)
+        solutions.append({cage.id: tuple(solution[cage].tolist()) for cage in kenken.cages})
+    assert solutions[0] == solutions[1]
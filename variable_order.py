@@ -0,0 +1,98 @@
+from typing import Callable, Dict, Hashable, Iterable, List
+
+class VariableOrder:
+    ''' Indexed binary heap of unassigned variables, ordered MRV first, then highest degree.
+
+    select_unassigned_variable used to sort every unassigned variable by
+    (domain size, -degree) at every node. Here the key of a variable only moves
+    when its domain size changes (update) or when it is assigned (remove) or
+    unassigned (push), each an O(log n) sift, and the next variable is the top
+    of the heap. Degrees are read once; remaining ties go to the earlier
+    variable in the order the variables were given.
+    '''
+    def __init__(self, sizes: Dict[Hashable, int], degree: Callable[[Hashable], int]):
+        self.size: Dict[Hashable, int] = dict(sizes)
+        self.degree = {var: degree(var) for var in self.size}
+        self.rank = {var: i for i, var in enumerate(self.size)}
+        self.heap: List[Hashable] = []
+        self.pos: Dict[Hashable, int] = {}
+        for var in self.size:
+            self.push(var)
+
+    def _key(self, var):
+        return (self.size[var], -self.degree[var], self.rank[var])
+
+    def _swap(self, i, j):
+        heap = self.heap
+        heap[i], heap[j] = heap[j], heap[i]
+        self.pos[heap[i]] = i
+        self.pos[heap[j]] = j
+
+    def _sift_up(self, i):
+        while i > 0:
+            parent = (i - 1) // 2
+            if self._key(self.heap[i]) >= self._key(self.heap[parent]):
+                break
+            self._swap(i, parent)
+            i = parent
+
+    def _sift_down(self, i):
+        n = len(self.heap)
+        while True:
+            smallest = i
+            for child in (2 * i + 1, 2 * i + 2):
+                if child < n and self._key(self.heap[child]) < self._key(self.heap[smallest]):
+                    smallest = child
+            if smallest == i:
+                return
+            self._swap(i, smallest)
+            i = smallest
+
+    def update(self, var, size: int):
+        ''' Record a new domain size for `var`; reorders it if it is in the heap '''
+        old = self.size[var]
+        if size == old:
+            return
+        self.size[var] = size
+        i = self.pos.get(var)
+        if i is not None:
+            self._sift_up(i) if size < old else self._sift_down(i)
+
+    def sync(self, sizes: Iterable, assigned=()):
+        ''' Catch up with (var, size) pairs and the set of assigned variables, for
+        callers that cannot report changes as they happen. O(n) reads, and a
+        sift only for the variables that actually changed. '''
+        for var, size in sizes:
+            self.update(var, size)
+            if var in assigned:
+                self.remove(var)
+            else:
+                self.push(var)
+
+    def push(self, var):
+        ''' Make `var` selectable again (it was unassigned) '''
+        if var in self.pos:
+            return
+        self.heap.append(var)
+        self.pos[var] = len(self.heap) - 1
+        self._sift_up(len(self.heap) - 1)
+
+    def remove(self, var):
+        ''' Take `var` out of the selection (it was assigned) '''
+        i = self.pos.pop(var, None)
+        if i is None:
+            return
+        last = self.heap.pop()
+        if i < len(self.heap):
+            self.heap[i] = last
+            self.pos[last] = i
+            self._sift_up(i)
+            self._sift_down(self.pos[last])
+
+    def peek(self):
+        ''' The unassigned variable with the fewest values (ties: highest degree) '''
+        return self.heap[0]
+
+    def __contains__(self, var):  return var in self.pos
+    def __len__(self):            return len(self.heap)
+    def __repr__(self):           return f"VariableOrder({len(self.heap)} of {len(self.size)} unassigned)"